@@ -0,0 +1,264 @@
+"""Persistence benchmarks for Cogs/Utils/database.py.
+
+Every combination of backend, database size and workload runs in its own
+process so load time and peak memory aren't skewed by earlier runs. The
+fixture is written beforehand by the parent, so peak RSS only covers
+loading the database and running the workload. Run from the DiscordBot
+folder:
+
+    python -m Benchmarks.database
+    python -m Benchmarks.database --backends json sqlite --sizes 1M 100M --workloads stars
+
+The json backend rewrites the whole file per mutation, so large sizes with
+it take a while. Lower ``--mutations`` for those.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import psutil
+
+from Cogs.Utils import database
+
+BACKENDS = {
+    'json': database.JSONBackend,
+    'log': database.LogBackend,
+    'sqlite': database.SQLiteBackend,
+}
+
+SIZES = {
+    '1K': 1024,
+    '100K': 100 * 1024,
+    '1M': 1024 ** 2,
+    '10M': 10 * 1024 ** 2,
+    '100M': 100 * 1024 ** 2,
+}
+
+# Rough encoded sizes of one entry, used to fill a database up to a given size.
+STAR_ENTRY_SIZE = 90
+PLAYER_ENTRY_SIZE = 40
+TICKER_ENTRY_SIZE = 80
+STARS_PER_GUILD = 200
+
+
+def snowflake():
+    return str(random.randint(10 ** 17, 10 ** 18))
+
+
+def star_entry():
+    return [snowflake(), [snowflake() for _ in range(random.randint(1, 3))]]
+
+
+def stars_data(size):
+    """Starboards shaped like stars.json, spread over as many guilds as the size needs."""
+    data = {}
+    entries = max(size // STAR_ENTRY_SIZE, 1)
+    for _ in range(max(entries // STARS_PER_GUILD, 1)):
+        guild = {'channel': snowflake()}
+        for _ in range(min(entries, STARS_PER_GUILD)):
+            guild[snowflake()] = star_entry()
+        data[snowflake()] = guild
+    return data
+
+
+def players_data(size):
+    """Dota ids mapped to names, like Dota/notable_players.json."""
+    return {str(random.randint(10 ** 7, 10 ** 9)): 'player%d' % i
+            for i in range(max(size // PLAYER_ENTRY_SIZE, 1))}
+
+
+def ticker_data(size):
+    """Per-server match ticker settings."""
+    return {snowflake(): {'enabled': True, 'channel_id': snowflake()}
+            for _ in range(max(size // TICKER_ENTRY_SIZE, 1))}
+
+
+async def stars_workload(db, mutations, timings):
+    """Reaction bursts across guilds, half new stars and half extra starrers."""
+    guilds = list(db.all())
+    for _ in range(mutations):
+        guild_id = random.choice(guilds)
+        guild = db.get(guild_id)
+        messages = [k for k in guild if k != 'channel'] if random.random() < 0.5 else None
+        if messages:
+            message_id = random.choice(messages)
+            stars = guild[message_id]
+            stars[1].append(snowflake())
+        else:
+            message_id, stars = snowflake(), star_entry()
+
+        start = time.perf_counter()
+        await db.put_path((guild_id, message_id), stars)
+        timings['put'].append(time.perf_counter() - start)
+
+
+async def players_workload(db, mutations, timings):
+    """One put per player, like update_dotabuff_verified_players."""
+    for i in range(mutations):
+        start = time.perf_counter()
+        await db.put(random.randint(10 ** 7, 10 ** 9), 'verified%d' % i)
+        timings['put'].append(time.perf_counter() - start)
+
+
+async def ticker_workload(db, mutations, timings, reads_per_write=50):
+    """Mostly lookups of ticker settings with the odd settings change."""
+    servers = list(db.all())
+    for _ in range(mutations):
+        for _ in range(reads_per_write):
+            server_id = random.choice(servers)
+            start = time.perf_counter()
+            db.get(server_id)
+            timings['get'].append(time.perf_counter() - start)
+
+        settings = {'enabled': random.random() < 0.5, 'channel_id': snowflake()}
+        start = time.perf_counter()
+        await db.put(random.choice(servers), settings)
+        timings['put'].append(time.perf_counter() - start)
+
+
+WORKLOADS = {
+    'stars': (stars_data, stars_workload),
+    'players': (players_data, players_workload),
+    'ticker': (ticker_data, ticker_workload),
+}
+
+
+def written_bytes():
+    counters = psutil.Process().io_counters()
+    return getattr(counters, 'write_chars', counters.write_bytes)
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def make_fixture(backend, size, workload, directory):
+    """Writes the database a case starts from and returns its name and the json size."""
+    random.seed(size)
+    make_data, _ = WORKLOADS[workload]
+    snapshot = os.path.join(directory, 'bench.json')
+    with open(snapshot, 'w') as f:
+        json.dump(make_data(SIZES[size]), f, ensure_ascii=True, indent=4)
+    file_size = os.path.getsize(snapshot)
+
+    if backend != 'sqlite':
+        return snapshot, file_size
+    name = os.path.join(directory, 'bench.db')
+    database.migrate(snapshot, name)
+    return name, file_size
+
+
+def run_case(backend, name, size, workload, mutations, flush_interval, results):
+    random.seed(size)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        _, run_workload = WORKLOADS[workload]
+        baseline = psutil.Process().memory_info().rss
+
+        start = time.perf_counter()
+        db = database.Database(name, backend=BACKENDS[backend], loop=loop, flush_interval=flush_interval)
+        load_time = time.perf_counter() - start
+
+        timings = {'put': [], 'get': []}
+        before = written_bytes()
+        start = time.perf_counter()
+        loop.run_until_complete(run_workload(db, mutations, timings))
+        loop.run_until_complete(db.close())
+        elapsed = time.perf_counter() - start
+
+        results.put({
+            'load': load_time,
+            'elapsed': elapsed,
+            'put': [percentile(timings['put'], p) for p in (50, 90, 99)],
+            'get': [percentile(timings['get'], p) for p in (50, 99)],
+            'written': (written_bytes() - before) / mutations,
+            # Kilobytes on Linux. Only loading and the workload ran in this
+            # process, so this is what they took on top of the interpreter.
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - baseline,
+        })
+    finally:
+        loop.close()
+
+
+def run(backend, size, workload, mutations, flush_interval):
+    directory = tempfile.mkdtemp(prefix='dbbench')
+    try:
+        name, file_size = make_fixture(backend, size, workload, directory)
+
+        # Spawned rather than forked, a forked child starts out with this
+        # process' peak RSS, fixture generation included.
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=run_case,
+                                  args=(backend, name, size, workload, mutations, flush_interval, results))
+        process.start()
+        process.join()
+        result = results.get() if not results.empty() else None
+    finally:
+        shutil.rmtree(directory)
+
+    if result is not None:
+        result.update(backend=backend, size=size, workload=workload, file_size=file_size)
+    return result
+
+
+def report(result):
+    ms = lambda s: '%.3f' % (s * 1000)
+    us = lambda s: '-' if s != s else '%.1f' % (s * 10 ** 6)
+    row = [result['backend'], result['size'], result['workload'],
+           '%.1f' % (result['file_size'] / 1024 ** 2), ms(result['load']), '%.2f' % result['elapsed']]
+    row += [ms(p) for p in result['put']]
+    row += [us(p) for p in result['get']]
+    row += ['%.0f' % result['written'], '%.1f' % (result['peak_rss'] / 1024 ** 2)]
+    return row
+
+
+HEADER = ['backend', 'size', 'workload', 'file MB', 'load ms', 'total s',
+          'put p50 ms', 'put p90 ms', 'put p99 ms', 'get p50 us', 'get p99 us',
+          'bytes/mutation', 'peak RSS +MB']
+
+
+def print_table(rows):
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(str(cell).rjust(width) for cell, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the Database storage backends.')
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+    parser.add_argument('--mutations', type=int, default=200, help='mutations per run')
+    parser.add_argument('--flush-interval', type=float, default=None,
+                        help='runs with write coalescing at this interval in seconds')
+    args = parser.parse_args()
+
+    rows = [HEADER]
+    for workload in args.workloads:
+        for size in args.sizes:
+            for backend in args.backends:
+                result = run(backend, size, workload, args.mutations, args.flush_interval)
+                if result is None:
+                    print('[Benchmark] {0} / {1} / {2} failed.'.format(backend, size, workload))
+                    continue
+                rows.append(report(result))
+                print('[Benchmark] Finished {0} / {1} / {2}.'.format(backend, size, workload))
+
+    print()
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Load benchmark for Cogs/dota2.py against the Steam Web API stand-in.
+
+Runs the last_match, dotabuff and mmr commands for random members and a
+match ticker sweep, with thousands of linked members spread over a number
+of servers. Steam calls are answered by Benchmarks/steam_standin.py running
+in its own process and profile cards by a fake Node bridge that takes
+``--node-latency`` seconds per card. Run from the DiscordBot folder:
+
+    python -m Benchmarks.dota
+    python -m Benchmarks.dota --members 10000 --servers 50 --latency 0.1 --error-rate 0.01
+
+Every phase runs ``--rounds`` times so the effect of the SteamAPI caches
+shows up in the later rounds. For each one the table has the Steam calls
+per command, wall time, command latency and how long the event loop was
+blocked for.
+"""
+import argparse
+import asyncio
+import glob
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import tempfile
+import time
+
+import aiohttp
+
+from Benchmarks import steam_standin
+from Benchmarks.database import percentile, print_table
+from Cogs import dota2
+from Cogs.Utils import matchstore, steamapi
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+
+class Monitor:
+    """Measures how long the event loop was kept from running other tasks."""
+
+    def __init__(self, loop, interval=0.005, threshold=0.01):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.worst = 0.0
+
+    async def run(self):
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.interval)
+            lag = self.loop.time() - start - self.interval
+            if lag > self.threshold:
+                self.blocked += lag
+                self.worst = max(self.worst, lag)
+
+    def reset(self):
+        self.blocked = 0.0
+        self.worst = 0.0
+
+
+class Member:
+    def __init__(self, id_, name):
+        self.id = id_
+        self.name = name
+        self.mention = '<@{0}>'.format(id_)
+
+
+class Server:
+    def __init__(self, id_, members):
+        self.id = id_
+        self.name = 'server{0}'.format(id_)
+        self.members = members
+
+
+class Channel:
+    def __init__(self, id_):
+        self.id = id_
+        self.mention = '<#{0}>'.format(id_)
+
+
+class Message:
+    def __init__(self, author=None, content=''):
+        self.author = author
+        self.content = content
+
+
+class Context:
+    def __init__(self, author):
+        self.message = Message(author)
+
+
+class Bot:
+    """Just enough of a commands.Bot for the Dota cog to run."""
+
+    def __init__(self, loop, steam_api, match_store, node, servers, steam_info):
+        self.loop = loop
+        self.steam_api = steam_api
+        self.match_store = match_store
+        self.node = node
+        self.servers = servers
+        self.steam_info = steam_info
+        self.dota_ticker_settings = {server.id: {'enabled': True, 'channel_id': server.id} for server in servers}
+        self.is_closed = False
+        self.sent = 0
+
+    def get_channel(self, id_):
+        return Channel(id_)
+
+    async def say(self, content):
+        self.sent += 1
+        return Message(content=content)
+
+    async def send_message(self, destination, content):
+        self.sent += 1
+        return Message(content=content)
+
+    async def edit_message(self, message, content):
+        message.content = content
+        return message
+
+    async def delete_message(self, message):
+        pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def standin_call(session, base_url, path):
+    async with session.get(base_url + path) as response:
+        return await response.json()
+
+
+async def wait_for_standin(session, base_url, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await standin_call(session, base_url, '_stats')
+        except (aiohttp.ClientError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def make_members(count, servers, accounts, rng):
+    """Members with one or two linked accounts, each in one or a few servers."""
+    members = [Member(str(10 ** 17 + i), 'member{0}'.format(i)) for i in range(count)]
+    steam_info = {}
+    for member in members:
+        dota_ids = rng.sample(range(1, accounts + 1), 1 if rng.random() < 0.8 else 2)
+        steam_info[member.id] = [str(steamapi.ID.dota_to_steam(dota_id)) for dota_id in dota_ids]
+
+    server_members = [[] for _ in range(servers)]
+    for member in members:
+        for server in rng.sample(range(servers), min(servers, rng.choice([1, 1, 1, 2, 3]))):
+            server_members[server].append(member)
+
+    return members, [Server(str(10 ** 16 + i), m) for i, m in enumerate(server_members)], steam_info
+
+
+class Node:
+    """Stands in for the NodeBridge, answering like a GC that takes ``latency`` per profile card."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def hello(self, name='MT5ABot', **kwargs):
+        return 'Hello, ' + name
+
+    async def get_match_details(self, match_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        return None
+
+    async def get_mmr_for_dotaid(self, dota_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        return 4000, 3500
+
+    async def get_mmr_for_dotaids(self, dota_ids, **kwargs):
+        # The bridge fetches the cards side by side.
+        await asyncio.sleep(self.latency)
+        return {int(dota_id): (4000, 3500) for dota_id in dota_ids}
+
+
+async def run_command(cog, command, members, count, concurrency, rng):
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def invoke(member):
+        with await semaphore:
+            start = time.perf_counter()
+            await command.callback(cog, Context(member), member=None)
+            timings.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[invoke(rng.choice(members)) for _ in range(count)])
+    return timings
+
+
+async def run_sweep(cog, backlog):
+    """Times rebuilding the ticker's watch list and catching up on ``backlog`` matches."""
+    start = time.perf_counter()
+    cog.ingester.watched = cog.ticker_players()
+    timings = [time.perf_counter() - start]
+
+    await cog.ingester_state.put('next_seq_num', await cog.ingester.head_seq_num() - backlog)
+    while True:
+        start = time.perf_counter()
+        full = await cog.ingester.ingest_page()
+        timings.append(time.perf_counter() - start)
+        if not full:
+            break
+
+    # Let the reports posted by the match events go out.
+    await asyncio.sleep(0.1)
+    return timings
+
+
+async def benchmark(args, loop, base_url):
+    rng = random.Random(0)
+    session = aiohttp.ClientSession(loop=loop)
+    await wait_for_standin(session, base_url)
+
+    store = matchstore.MatchStore('Dota/matches.db', loop=loop)
+    steam_api = steamapi.SteamAPI('benchmark', loop=loop, base_url=base_url, rate=args.rate, burst=args.burst)
+    members, servers, steam_info = make_members(args.members, args.servers, args.players, rng)
+    bot = Bot(loop, steam_api, store, Node(args.node_latency), servers, steam_info)
+
+    # The bot has no match_ticker set, the sweep below drives the ticker instead.
+    cog = dota2.Dota2(bot)
+
+    monitor = Monitor(loop)
+    monitoring = loop.create_task(monitor.run())
+
+    phases = [(name, getattr(cog, name)) for name in args.commands] + [('ticker sweep', None)]
+    rows = []
+    try:
+        for round_ in range(1, args.rounds + 1):
+            for name, command in phases:
+                await standin_call(session, base_url, '_reset')
+                monitor.reset()
+                sent = bot.sent
+
+                start = time.perf_counter()
+                if command is None:
+                    timings = await run_sweep(cog, args.backlog)
+                    count = 1
+                else:
+                    timings = await run_command(cog, command, members, args.count, args.concurrency, rng)
+                    count = args.count
+                elapsed = time.perf_counter() - start
+
+                calls = await standin_call(session, base_url, '_stats')
+                rows.append([name, round_, count, '%.2f' % (sum(calls.values()) / count),
+                             '%.2f' % elapsed, '%.1f' % (percentile(timings, 50) * 1000),
+                             '%.1f' % (percentile(timings, 99) * 1000), '%.3f' % monitor.blocked,
+                             '%.1f' % (monitor.worst * 1000), bot.sent - sent])
+                print('[Benchmark] Finished {0} round {1}.'.format(name, round_))
+    finally:
+        monitoring.cancel()
+        await cog.notable_players.close()
+        await cog.ingester_state.close()
+        steam_api.close()
+        store.close()
+        session.close()
+
+    return rows
+
+
+HEADER = ['phase', 'round', 'runs', 'calls/run', 'wall s', 'p50 ms', 'p99 ms', 'blocked s', 'worst stall ms',
+          'messages']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the Dota cog against a Steam Web API stand-in.')
+    parser.add_argument('--members', type=int, default=5000, help='linked members')
+    parser.add_argument('--servers', type=int, default=20, help='servers with the match ticker enabled')
+    parser.add_argument('--players', type=int, default=20000, help='accounts the stand-in knows about')
+    parser.add_argument('--commands', nargs='+', choices=['last_match', 'dotabuff', 'mmr'],
+                        default=['last_match', 'dotabuff', 'mmr'])
+    parser.add_argument('--count', type=int, default=500, help='invocations per command and round')
+    parser.add_argument('--concurrency', type=int, default=50, help='commands running at once')
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--backlog', type=int, default=2000, help='matches the ticker sweep catches up on')
+    parser.add_argument('--latency', type=float, default=0.05, help='average stand-in response time in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of stand-in responses that are 503s')
+    parser.add_argument('--node-latency', type=float, default=0.02, help='seconds per profile card')
+    parser.add_argument('--rate', type=float, default=1000.0, help='SteamAPI requests per second')
+    parser.add_argument('--burst', type=int, default=100, help='SteamAPI request burst')
+    args = parser.parse_args()
+
+    port = free_port()
+    standin = multiprocessing.Process(target=steam_standin.serve, args=(port,),
+                                      kwargs={'players': args.players, 'latency': args.latency,
+                                              'error_rate': args.error_rate},
+                                      daemon=True)
+    standin.start()
+
+    # The cog reads its data files from and keeps its databases in ./Dota.
+    directory = tempfile.mkdtemp(prefix='dotabench')
+    os.mkdir(os.path.join(directory, 'Dota'))
+    for name in glob.glob(os.path.join(REPO, 'Dota', '*.json')):
+        shutil.copy(name, os.path.join(directory, 'Dota'))
+    cwd = os.getcwd()
+    os.chdir(directory)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        rows = loop.run_until_complete(benchmark(args, loop, 'http://127.0.0.1:{0}/'.format(port)))
+    finally:
+        loop.close()
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+        standin.terminate()
+
+    print()
+    print_table([HEADER] + rows)
+
+
+if __name__ == '__main__':
+    main()
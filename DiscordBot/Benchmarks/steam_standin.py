@@ -0,0 +1,233 @@
+"""A local stand-in for the Steam Web API endpoints in Cogs/Utils/urls.py.
+
+Answers are generated from fixture data instead of fetched, after a
+configurable delay and with a configurable share of 503 errors, so the bot
+can be benchmarked without touching Valve's servers or quota. Run from the
+DiscordBot folder:
+
+    python -m Benchmarks.steam_standin --port 8642 --latency 0.05 --error-rate 0.01
+
+and point a SteamAPI at it with ``base_url='http://127.0.0.1:8642/'``.
+
+Players have the dota ids 1 to ``--players``, each finishing a match every
+``--match-interval`` seconds, and the sequence number firehose grows by
+``--matches-per-second``. GET /_stats returns how many requests each
+endpoint got and GET /_reset clears the counts.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from Cogs.Utils import urls
+
+STEAM_TO_DOTA_CONSTANT = 76561197960265728
+
+# Firehose matches use ids above anything a player's own match gets.
+FIREHOSE_START = 4 * 10 ** 9
+MATCHES_PER_EPOCH = 10 ** 4
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Dota')
+
+
+def load_fixture(name, default):
+    try:
+        with open(os.path.join(FIXTURES, name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+class SteamStandIn:
+    def __init__(self, players=10000, latency=0.05, error_rate=0.0, match_interval=300.0,
+                 matches_per_second=20.0, seed=0):
+        self.players = players
+        self.latency = latency
+        self.error_rate = error_rate
+        self.match_interval = match_interval
+        self.matches_per_second = matches_per_second
+        self.random = random.Random(seed)
+        self.started = time.time()
+        self.requests = Counter()
+
+        self.heroes = load_fixture('heroes.json', {'result': {'heroes': [], 'status': 200}})
+        self.items = load_fixture('items.json', {'result': {'items': [], 'status': 200}})
+        self.hero_ids = [hero['id'] for hero in self.heroes['result']['heroes']] or list(range(1, 113))
+
+        self.endpoints = {
+            urls.GET_MATCH_DETAILS: self.match_details,
+            urls.GET_MATCH_HISTORY: self.match_history,
+            urls.GET_MATCH_HISTORY_BY_SEQ_NUM: self.match_history_by_seq_num,
+            urls.GET_PLAYER_SUMMARIES: self.player_summaries,
+            urls.RESOLVE_VANITY_URL: self.resolve_vanity_url,
+            urls.GET_HEROES: lambda params: self.heroes,
+            urls.GET_GAME_ITEMS: lambda params: self.items,
+            urls.GET_LEAGUE_LISTING: lambda params: {'result': {'leagues': []}},
+            urls.GET_LIVE_LEAGUE_GAMES: lambda params: {'result': {'games': [], 'status': 200}},
+            urls.GET_TEAM_INFO_BY_TEAM_ID: lambda params: {'result': {'status': 1, 'teams': []}},
+            urls.GET_TOURNAMENT_PRIZE_POOL: lambda params: {'result': {'prize_pool': 0, 'status': 200}},
+        }
+
+    # Fixture data
+
+    @staticmethod
+    def dota_id(account_id):
+        account_id = int(account_id)
+        return account_id - STEAM_TO_DOTA_CONSTANT if account_id > STEAM_TO_DOTA_CONSTANT else account_id
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def latest_match_id(self, dota_id):
+        # Stagger the players so matches keep ending all the time.
+        offset = dota_id * 7919 % self.match_interval
+        epoch = int((self.elapsed() + offset) / self.match_interval)
+        return dota_id * MATCHES_PER_EPOCH + epoch % MATCHES_PER_EPOCH
+
+    def head_seq_num(self):
+        return FIREHOSE_START + int(self.elapsed() * self.matches_per_second)
+
+    def match(self, match_id):
+        """Returns the details of a match, made up from its id."""
+        rng = random.Random(match_id)
+        if match_id >= FIREHOSE_START:
+            # Firehose matches are mostly strangers, with a linked player now and then.
+            accounts = rng.sample(range(1, self.players * 20), 10)
+        elif 0 < match_id // MATCHES_PER_EPOCH <= self.players:
+            accounts = [match_id // MATCHES_PER_EPOCH] + rng.sample(range(1, self.players * 20), 9)
+            rng.shuffle(accounts)
+        else:
+            return None
+
+        duration = rng.randint(900, 3600)
+        return {
+            'match_id': match_id,
+            'match_seq_num': match_id,
+            'radiant_win': rng.random() < 0.5,
+            'duration': duration,
+            'start_time': int(time.time()) - duration,
+            'lobby_type': 7,
+            'game_mode': 22,
+            'cluster': 111,
+            'human_players': 10,
+            'players': [{
+                'account_id': account_id,
+                'player_slot': slot if slot < 5 else 128 + slot - 5,
+                'hero_id': rng.choice(self.hero_ids),
+                'level': rng.randint(10, 25),
+                'kills': rng.randint(0, 20),
+                'deaths': rng.randint(0, 15),
+                'assists': rng.randint(0, 30),
+                'gold_per_min': rng.randint(200, 800),
+                'xp_per_min': rng.randint(200, 800),
+                'last_hits': rng.randint(0, 400),
+                'denies': rng.randint(0, 30),
+            } for slot, account_id in enumerate(accounts)],
+        }
+
+    # Endpoints
+
+    def match_details(self, params):
+        match = self.match(int(params.get('match_id', 0)))
+        if match is None:
+            return {'result': {'error': 'Match ID not found'}}
+        return {'result': match}
+
+    def match_history(self, params):
+        if 'account_id' in params:
+            dota_id = self.dota_id(params['account_id'])
+            if not 0 < dota_id <= self.players:
+                return {'result': {'status': 15, 'statusDetail': 'Cannot get match history for a user that hasn\'t '
+                                                                 'allowed it'}}
+            match = self.match(self.latest_match_id(dota_id))
+        else:
+            match = self.match(self.head_seq_num())
+
+        summary = {k: match[k] for k in ('match_id', 'match_seq_num', 'start_time', 'lobby_type')}
+        summary['players'] = [{k: p[k] for k in ('account_id', 'player_slot', 'hero_id')} for p in match['players']]
+        return {'result': {'status': 1, 'num_results': 1, 'total_results': 500, 'results_remaining': 499,
+                           'matches': [summary]}}
+
+    def match_history_by_seq_num(self, params):
+        start = max(int(params.get('start_at_match_seq_num', FIREHOSE_START)), FIREHOSE_START)
+        count = min(int(params.get('matches_requested', 100)), 100)
+        end = min(start + count, self.head_seq_num())
+        return {'result': {'status': 1, 'matches': [self.match(seq) for seq in range(start, end)]}}
+
+    def player_summaries(self, params):
+        players = []
+        for steam_id in params.get('steamids', '').split(',')[:100]:
+            if steam_id.isdigit() and 0 < self.dota_id(steam_id) <= self.players:
+                players.append({'steamid': steam_id, 'personaname': 'player{0}'.format(self.dota_id(steam_id)),
+                                'communityvisibilitystate': 3, 'profilestate': 1})
+        return {'response': {'players': players}}
+
+    def resolve_vanity_url(self, params):
+        name = params.get('vanityurl', '')
+        if name.startswith('player') and name[6:].isdigit() and 0 < int(name[6:]) <= self.players:
+            return {'response': {'success': 1, 'steamid': str(int(name[6:]) + STEAM_TO_DOTA_CONSTANT)}}
+        return {'response': {'success': 42, 'message': 'No match'}}
+
+    # Server
+
+    async def handle(self, request):
+        api_path = request.match_info['path']
+        self.requests[api_path] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency * (0.5 + self.random.random()))
+
+        endpoint = self.endpoints.get(api_path)
+        if endpoint is None:
+            return web.Response(status=404, text='<html><body>Not Found</body></html>', content_type='text/html')
+        if self.random.random() < self.error_rate:
+            return web.Response(status=503, text='<html><body>Service Unavailable</body></html>',
+                                content_type='text/html')
+
+        return web.json_response(endpoint(request.GET))
+
+    async def stats(self, request):
+        return web.json_response(dict(self.requests))
+
+    async def reset(self, request):
+        self.requests.clear()
+        return web.json_response({})
+
+    def app(self, loop=None):
+        app = web.Application(loop=loop)
+        app.router.add_route('GET', '/_stats', self.stats)
+        app.router.add_route('GET', '/_reset', self.reset)
+        app.router.add_route('GET', '/{path:.+/}', self.handle)
+        return app
+
+
+def serve(port, host='127.0.0.1', **options):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    web.run_app(SteamStandIn(**options).app(loop), host=host, port=port, print=lambda *args: None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves made up Steam Web API responses.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8642)
+    parser.add_argument('--players', type=int, default=10000, help='players with a match history')
+    parser.add_argument('--latency', type=float, default=0.05, help='average seconds per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 503')
+    parser.add_argument('--match-interval', type=float, default=300.0,
+                        help='seconds between the matches of one player')
+    parser.add_argument('--matches-per-second', type=float, default=20.0, help='growth of the firehose')
+    args = parser.parse_args()
+
+    print('[SteamStandIn] Serving on http://{0}:{1}/'.format(args.host, args.port))
+    serve(args.port, args.host, players=args.players, latency=args.latency, error_rate=args.error_rate,
+          match_interval=args.match_interval, matches_per_second=args.matches_per_second)
+
+
+if __name__ == '__main__':
+    main()
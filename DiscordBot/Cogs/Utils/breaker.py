@@ -0,0 +1,53 @@
+import time
+
+
+class CircuitBreaker:
+    """Stops calls to something that keeps failing.
+
+    After ``failures`` failed calls in a row the breaker opens and
+    :meth:`allow` turns calls away. Every ``reset_after`` seconds while open
+    one call is let through as a probe, and the breaker closes again as soon
+    as a call succeeds.
+    """
+
+    def __init__(self, failures=3, reset_after=30.0, *, timer=time.monotonic):
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.timer = timer
+
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+
+    @property
+    def open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+
+        now = self.timer()
+        if now - self.opened_at >= self.reset_after:
+            # Let this call probe and hold everything else back for another
+            # period, so a probe that never finishes can't wedge the breaker.
+            self.opened_at = now
+            return True
+
+        self.rejected += 1
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            self.opened_at = self.timer()
+
+    def retry_in(self):
+        """Seconds until the next probe is let through, 0 when closed."""
+        if self.opened_at is None:
+            return 0.0
+        return max(self.opened_at + self.reset_after - self.timer(), 0.0)
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """A size bounded least recently used cache whose entries expire.
+
+    Entries live for ``ttl`` seconds unless :meth:`put` is given a different
+    ``ttl``, and once more than ``maxsize`` entries are cached the least
+    recently used ones are dropped. Hits and misses are counted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, *, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            expires, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires is not None and expires <= self.timer():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (self.timer() + ttl if ttl is not None else None, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and (entry[0] is None or entry[0] > self.timer())
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,6 +1,10 @@
 import asyncio
+import atexit
 import json
 import os
+import sqlite3
+import traceback
+from collections import OrderedDict
 
 
 def load_json_file(file_name):
@@ -10,15 +14,508 @@ def load_json_file(file_name):
         file_name))
     return inp_file
 
+
+def json_key(key):
+    """Returns the string json would use for ``key`` as an object member."""
+    if isinstance(key, str):
+        return key
+    return next(iter(json.loads(json.dumps({key: None}))))
+
+
+def set_path(db, path, value):
+    """Sets ``value`` at the end of a path of dict keys, creating missing dicts on the way."""
+    node = db
+    for key in path[:-1]:
+        node = node.setdefault(key, {})
+    node[path[-1]] = value
+
+
+def pop_path(db, path):
+    """Removes the entry at the end of a path of dict keys if it exists."""
+    node = db
+    for key in path[:-1]:
+        node = node.get(key)
+        if not isinstance(node, dict):
+            return
+    node.pop(path[-1], None)
+
+
+class Backend:
+    """Base class for the storage engines behind a :class:`Database`.
+
+    A backend sees every mutation twice. ``prepare`` runs on the event loop
+    and turns the pending changes into a batch that no longer depends on the
+    live data. ``write`` then persists that batch from a worker thread, in
+    the order the batches were prepared in.
+
+    Changes are ``(op, key, value)`` tuples with ``op`` being one of
+    ``'put'``, ``'remove'``, ``'put_path'`` or ``'remove_path'``. For the
+    latter two the key is a tuple of dict keys leading to a nested entry,
+    starting with the top-level key.
+    """
+
+    def __init__(self, name, *, object_hook=None, encoder=None, **options):
+        self.name = name
+        self.object_hook = object_hook
+        self.encoder = encoder
+
+    def encode(self, value):
+        return json.dumps(value, ensure_ascii=True, cls=self.encoder)
+
+    # Whether single entries can be read with keys and load_key, which
+    # lazily loaded databases need.
+    partial = False
+
+    def load(self):
+        raise NotImplementedError
+
+    def keys(self):
+        raise NotImplementedError
+
+    def load_key(self, key):
+        raise NotImplementedError
+
+    def prepare(self, db, changes):
+        return changes
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    def wants_compaction(self):
+        return False
+
+    def rotate(self):
+        pass
+
+    def merge(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JSONBackend(Backend):
+    """Keeps the whole database in a single json file, rewritten on every save.
+
+    Every top-level value is kept encoded next to the live data and only
+    re-encoded when it is put, so a save just stitches those immutable pieces
+    together. This costs a second copy of the database in memory but the
+    worker thread never looks at data the loop might be mutating.
+    """
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self._fragments = {}
+
+    def read_snapshot(self):
+        try:
+            with open(self.name, 'r') as f:
+                return json.load(f, object_hook=self.object_hook)
+        except FileNotFoundError:
+            return {}
+
+    def encode(self, value):
+        # Indented one level deeper, the way json.dump would nest it.
+        return json.dumps(value, ensure_ascii=True, cls=self.encoder, indent=4).replace('\n', '\n    ')
+
+    def load(self):
+        db = self.read_snapshot()
+        self._fragments = {json_key(key): self.encode(value) for key, value in db.items()}
+        return db
+
+    def prepare(self, db, changes):
+        for op, key, value in changes:
+            if op.endswith('_path'):
+                # The whole top-level value has to be encoded again either way.
+                key = key[0]
+                op, value = ('put', db[key]) if key in db else ('remove', None)
+
+            if op == 'put':
+                self._fragments[json_key(key)] = self.encode(value)
+            else:
+                self._fragments.pop(json_key(key), None)
+        return list(self._fragments.items())
+
+    def write(self, fragments):
+        members = ',\n'.join('    {0}: {1}'.format(json.dumps(key, ensure_ascii=True), fragment)
+                              for key, fragment in fragments)
+        with open(self.name, 'w') as f:
+            f.write('{\n' + members + '\n}' if members else '{}')
+
+
+class LogBackend(JSONBackend):
+    """Appends mutations to ``<name>.log`` on top of a json snapshot.
+
+    Once ``compact_after`` entries have piled up the log is folded back into
+    the ``<name>`` snapshot in the background. The snapshot keeps the plain
+    json format, so a database can move between this and :class:`JSONBackend`
+    freely.
+    """
+
+    def __init__(self, name, *, compact_after=1000, **options):
+        # Skips the fragments kept by JSONBackend, a save only ever appends to the log.
+        Backend.__init__(self, name, **options)
+        self.compact_after = compact_after
+        self.log_name = self.name + '.log'
+        self.compacting_name = self.name + '.log.old'
+        self._log_file = None
+        self._log_entries = 0
+
+    def load(self):
+        db = self.read_snapshot()
+
+        # Anything left over from an interrupted compaction is older
+        # than the active log, so it has to be replayed first.
+        self._replay(self.compacting_name, db)
+        self._log_entries, end = self._replay(self.log_name, db)
+
+        # New entries would be appended to a torn one and get lost with it.
+        if os.path.exists(self.log_name) and os.path.getsize(self.log_name) > end:
+            with open(self.log_name, 'r+b') as f:
+                f.truncate(end)
+        return db
+
+    def _replay(self, log_name, db):
+        """Applies the entries of a log file to ``db``.
+
+        Returns the number of entries applied and the offset where the last
+        of them ends. A torn entry at the end of the file (the process died
+        mid-write) is ignored.
+        """
+        applied = 0
+        end = 0
+        try:
+            with open(log_name, 'rb') as f:
+                for line in f:
+                    # An entry only counts once its newline made it to disk.
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        op, data = json.loads(line.decode(), object_hook=self.object_hook)
+                    except ValueError:
+                        break
+
+                    # Keys are stored as object members so they come back
+                    # exactly like they would from the snapshot.
+                    if op == 'put':
+                        db.update(data)
+                    elif op == 'remove':
+                        for key in data:
+                            db.pop(key, None)
+                    elif op == 'put_path':
+                        set_path(db, data[0], data[1])
+                    elif op == 'remove_path':
+                        pop_path(db, data)
+                    applied += 1
+                    end += len(line)
+        except FileNotFoundError:
+            pass
+
+        return applied, end
+
+    def prepare(self, db, changes):
+        # Encoded on the loop so the entries can't change while they are written.
+        lines = []
+        for op, key, value in changes:
+            if op == 'put_path':
+                data = [[json_key(k) for k in key], value]
+            elif op == 'remove_path':
+                data = [json_key(k) for k in key]
+            else:
+                data = {key: value}
+            lines.append(json.dumps([op, data], ensure_ascii=True, cls=self.encoder))
+        return lines
+
+    def write(self, lines):
+        if self._log_file is None:
+            self._log_file = open(self.log_name, 'a')
+        self._log_file.write(''.join(line + '\n' for line in lines))
+        self._log_file.flush()
+        self._log_entries += len(lines)
+
+    def wants_compaction(self):
+        return self._log_entries >= self.compact_after
+
+    def rotate(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        self._log_entries = 0
+
+        # A leftover from an interrupted compaction gets merged on its own.
+        if not os.path.exists(self.compacting_name) and os.path.exists(self.log_name):
+            os.replace(self.log_name, self.compacting_name)
+
+    def merge(self):
+        if not os.path.exists(self.compacting_name):
+            return
+
+        snapshot = self.read_snapshot()
+        self._replay(self.compacting_name, snapshot)
+
+        tmp_name = self.name + '.tmp'
+        with open(tmp_name, 'w') as f:
+            json.dump(snapshot, f, ensure_ascii=True, cls=self.encoder, indent=4)
+        os.replace(tmp_name, self.name)
+
+        # Replaying the old log again after a crash here is harmless, every
+        # entry sets or deletes a key so applying it twice changes nothing.
+        os.remove(self.compacting_name)
+
+    def close(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+
+class SQLiteBackend(Backend):
+    """Stores every top-level key as its own row of an SQLite table.
+
+    Top-level dicts are split up one level further, each of their members
+    is a row of its own in a second table. Changing a member with
+    ``put_path`` writes just that member's row however big the dict is.
+    Only the rows touched by a save are written, all of them inside one
+    transaction.
+
+    Single rows are read through a second connection that stays on the
+    event loop. The database runs in WAL mode so those reads never wait
+    for a write to finish.
+    """
+
+    partial = True
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        # Only ever used from one thread at a time, the database lock sees to that.
+        self.connection = sqlite3.connect(self.name, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS members (key TEXT NOT NULL, member TEXT NOT NULL, '
+                                'value TEXT NOT NULL, PRIMARY KEY (key, member)) WITHOUT ROWID')
+        self.connection.commit()
+        self.reader = sqlite3.connect(self.name)
+
+    def decode(self, value, members):
+        if value == '{}' and members:
+            # Put back together as text so the object hook sees the dict like it was stored.
+            value = '{' + ', '.join('{0}: {1}'.format(json.dumps(member, ensure_ascii=True), member_value)
+                                    for member, member_value in members) + '}'
+        return json.loads(value, object_hook=self.object_hook)
+
+    def load(self):
+        members = {}
+        for key, member, value in self.connection.execute('SELECT key, member, value FROM members'):
+            members.setdefault(key, []).append((member, value))
+
+        rows = self.connection.execute('SELECT key, value FROM entries')
+        return {key: self.decode(value, members.get(key)) for key, value in rows}
+
+    def keys(self):
+        return [key for key, in self.connection.execute('SELECT key FROM entries')]
+
+    def load_key(self, key):
+        key = json_key(key)
+        row = self.reader.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        members = self.reader.execute('SELECT member, value FROM members WHERE key = ?', (key,)).fetchall()
+        return self.decode(row[0], members)
+
+    def put_statements(self, key, value):
+        statements = [('DELETE FROM members WHERE key = ?', (key,))]
+        if isinstance(value, dict):
+            statements.append(("INSERT OR REPLACE INTO entries (key, value) VALUES (?, '{}')", (key,)))
+            statements.extend(('INSERT INTO members (key, member, value) VALUES (?, ?, ?)',
+                               (key, json_key(member), self.encode(member_value)))
+                              for member, member_value in value.items())
+        else:
+            statements.append(('INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)', (key, self.encode(value))))
+        return statements
+
+    def prepare(self, db, changes):
+        statements = []
+        for op, key, value in changes:
+            if op == 'put':
+                statements.extend(self.put_statements(json_key(key), value))
+            elif op == 'remove':
+                statements.append(('DELETE FROM entries WHERE key = ?', (json_key(key),)))
+                statements.append(('DELETE FROM members WHERE key = ?', (json_key(key),)))
+            else:
+                row, member = json_key(key[0]), json_key(key[1])
+                parent = db.get(key[0])
+                if len(key) > 2:
+                    # Anything deeper is written as part of its member.
+                    if isinstance(parent, dict) and key[1] in parent:
+                        op, value = 'put_path', parent[key[1]]
+                    else:
+                        op = 'remove_path'
+
+                # The put_path that created the top-level dict may have been
+                # coalesced away, the dict stays even if its member is gone.
+                if op == 'put_path' or isinstance(parent, dict):
+                    statements.append(("INSERT OR IGNORE INTO entries (key, value) VALUES (?, '{}')", (row,)))
+                if op == 'put_path':
+                    statements.append(('INSERT OR REPLACE INTO members (key, member, value) VALUES (?, ?, ?)',
+                                       (row, member, self.encode(value))))
+                else:
+                    statements.append(('DELETE FROM members WHERE key = ? AND member = ?', (row, member)))
+        return statements
+
+    def write(self, statements):
+        with self.connection:
+            for statement, parameters in statements:
+                self.connection.execute(statement, parameters)
+
+    def close(self):
+        self.connection.close()
+        self.reader.close()
+
+
+class Index:
+    """A reverse lookup over the values of a :class:`Database`.
+
+    ``func`` is called with every key and value of the database and yields
+    ``(index_key, target)`` pairs. Index keys are expected to be unique
+    across the whole database.
+
+    With ``nested=True`` ``func`` is called with the key, member key and
+    member value of every member of the top-level dicts instead. Changing a
+    single member with :meth:`Database.put_path` then only indexes that
+    member again rather than the whole top-level value.
+    """
+
+    def __init__(self, func, nested=False):
+        self.func = func
+        self.nested = nested
+        self.entries = {}
+        self._index_keys = {}
+        # Members of every top-level key that have index entries, when nested.
+        self._members = {}
+
+    def _set(self, owner, pairs):
+        self._drop(owner)
+        index_keys = []
+        for index_key, target in pairs:
+            self.entries[index_key] = target
+            index_keys.append(index_key)
+        if index_keys:
+            self._index_keys[owner] = index_keys
+        return bool(index_keys)
+
+    def _drop(self, owner):
+        for index_key in self._index_keys.pop(owner, ()):
+            self.entries.pop(index_key, None)
+
+    def add(self, key, value):
+        self.discard(key)
+        if not self.nested:
+            self._set(key, self.func(key, value))
+        elif isinstance(value, dict):
+            for member, member_value in value.items():
+                self.add_member(key, member, member_value)
+
+    def discard(self, key):
+        if not self.nested:
+            self._drop(key)
+            return
+        for member in self._members.pop(key, ()):
+            self._drop((key, member))
+
+    def add_member(self, key, member, value):
+        if self._set((key, member), self.func(key, member, value)):
+            self._members.setdefault(key, set()).add(member)
+        else:
+            self.discard_member(key, member)
+
+    def discard_member(self, key, member):
+        self._drop((key, member))
+        members = self._members.get(key)
+        if members is not None:
+            members.discard(member)
+            if not members:
+                del self._members[key]
+
+    def rebuild(self, db):
+        self.entries.clear()
+        self._index_keys.clear()
+        self._members.clear()
+        for key, value in db.items():
+            self.add(key, value)
+
+
 class Database:
-    """The database object. Internally based on ''json''."""
+    """The database object. Internally based on ''json''.
+
+    Where the data is kept is up to the ``backend`` option, a :class:`Backend`
+    subclass that gets constructed with the database name and any leftover
+    options. It defaults to :class:`JSONBackend`, or :class:`LogBackend` when
+    ``log=True`` is passed.
+
+    Passing ``flush_interval`` (in seconds) turns on write coalescing. Puts
+    and removes then only queue their change and return, and a background
+    flusher writes whatever has queued up at most once per interval. Pass
+    ``durable=True`` to wait until a change has actually been written.
+    Anything still queued is written by :meth:`close` or at interpreter exit.
+
+    Nested entries can be changed on their own with :meth:`put_path` and
+    :meth:`remove_path`. :class:`LogBackend` then only appends the change
+    and :class:`SQLiteBackend` only writes the row of the top-level member
+    it falls under, while :class:`JSONBackend` still rewrites everything.
+
+    Reverse lookups can be declared with :meth:`create_index`. Indexes are
+    kept up to date by every put and remove and rebuilt whenever the
+    database is loaded. Nested indexes are only updated for the member a
+    :meth:`put_path` or :meth:`remove_path` touched.
+
+    With ``lazy=True`` only the keys are read up front and every top-level
+    entry is loaded the first time it is used. Passing ``evict_after`` (in
+    seconds) as well drops entries from memory again once they have not been
+    used for that long. This needs a backend that can load single entries
+    such as :class:`SQLiteBackend`, and string keys. Indexes only cover the
+    entries that are currently loaded, while :meth:`all` loads everything.
+
+    ``migrate_from`` names a json database this one replaces. If the database
+    doesn't exist yet when it is opened, that json database is imported
+    first, see :func:`migrate`.
+    """
 
     def __init__(self, name, **options):
         self.name = name
         self.object_hook = options.pop('object_hook', None)
         self.encoder = options.pop('encoder', None)
         self.loop = options.pop('loop', asyncio.get_event_loop())
-        if options.pop('load_later', False):
+        load_later = options.pop('load_later', False)
+        self.flush_interval = options.pop('flush_interval', None)
+        self.lazy = options.pop('lazy', False)
+        self.evict_after = options.pop('evict_after', None)
+
+        backend = options.pop('backend', LogBackend if options.pop('log', False) else JSONBackend)
+        if self.lazy and not backend.partial:
+            raise ValueError('{0} can not load single entries lazily.'.format(backend.__name__))
+
+        migrate_from = options.pop('migrate_from', None)
+        if migrate_from is not None and not os.path.exists(name):
+            count = migrate(migrate_from, name, backend, object_hook=self.object_hook, encoder=self.encoder,
+                            **options)
+            if count is not None:
+                print('[Database] Migrated {0} keys from {1} to {2}.'.format(count, migrate_from, name))
+        self.backend = backend(name, object_hook=self.object_hook, encoder=self.encoder, **options)
+        self._compaction = None
+
+        self._stored = set()
+        self._last_used = {}
+        self._evictor = None
+        if self.lazy and self.evict_after is not None:
+            self._evictor = self.loop.create_task(self._evict_idle())
+
+        self._pending = []
+        self._pending_flush = None
+        self._flusher = None
+        self._indexes = {}
+        if self.flush_interval is not None:
+            atexit.register(self._flush_at_exit)
+
+        if load_later:
             self.loop.create_task(self.load())
         else:
             self.load_from_file()
@@ -26,42 +523,317 @@ class Database:
         self.lock = asyncio.Lock()
 
     def load_from_file(self):
-        try:
-            with open(self.name, 'r') as f:
-                self._db = json.load(f, object_hook=self.object_hook)
-        except FileNotFoundError:
+        if self.lazy:
             self._db = {}
+            self._stored = set(self.backend.keys())
+        else:
+            self._db = self.backend.load()
+        for index in self._indexes.values():
+            index.rebuild(self._db)
 
     async def load(self):
         await self.loop.run_in_executor(None, self.load_from_file)
 
-    def _dump(self):
-        with open(self.name, 'w') as f:
-            json.dump(self._db, f, ensure_ascii=True, cls=self.encoder, indent=4)
+    async def save(self, changes=()):
+        # The batch is taken in one go on the loop, so it is a consistent view
+        # of the database no matter what gets mutated while it is written.
+        # The lock only keeps the writes in order.
+        batch = self.backend.prepare(self._db, changes)
+        with await self.lock:
+            await self.loop.run_in_executor(None, self.backend.write, batch)
+
+        if self.backend.wants_compaction() and self._compaction is None:
+            self._compaction = self.loop.create_task(self.compact())
+
+    async def compact(self):
+        """Lets the backend fold its write log into its main storage.
+
+        Only swapping out the log happens under the lock, the actual merge
+        runs in the background while mutations keep going.
+        """
+        try:
+            with await self.lock:
+                await self.loop.run_in_executor(None, self.backend.rotate)
+
+            await self.loop.run_in_executor(None, self.backend.merge)
+        finally:
+            self._compaction = None
+
+    async def _commit(self, changes):
+        """Saves or queues ``changes``.
+
+        Returns a future that completes once a queued change is written,
+        or ``None`` if it has been written already.
+        """
+        if self.flush_interval is None:
+            await self.save(changes)
+            return None
+
+        self._pending.extend(changes)
+        if self._pending_flush is None:
+            self._pending_flush = self.loop.create_future()
+        if self._flusher is None:
+            self._flusher = self.loop.create_task(self._flush_later())
+        return self._pending_flush
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flusher = None
+        try:
+            await self.flush()
+        except Exception:
+            traceback.print_exc()
+
+    async def flush(self):
+        """Writes every queued change right away."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
 
-    async def save(self):
-        await self.loop.run_in_executor(None, self._dump)
+        changes, self._pending = self._pending, []
+        flushed, self._pending_flush = self._pending_flush, None
+
+        # Only the last change to each key matters for what ends up on disk.
+        # Except that a put_path also creates the dicts on its way, which a
+        # later remove_path of the same path leaves in place, so the last of
+        # each is kept for paths.
+        latest = OrderedDict()
+        for change in changes:
+            key = (change[0] == 'remove_path', change[1])
+            latest.pop(key, None)
+            latest[key] = change
+
+        try:
+            if latest:
+                await self.save(list(latest.values()))
+        except Exception:
+            # Keep everything queued, including whoever waits on it, and try again later.
+            self._pending[:0] = changes
+            if flushed is not None:
+                if self._pending_flush is None:
+                    self._pending_flush = flushed
+                else:
+                    self._pending_flush.add_done_callback(lambda f: flushed.set_result(None))
+            if self._flusher is None:
+                self._flusher = self.loop.create_task(self._flush_later())
+            raise
+
+        if flushed is not None:
+            flushed.set_result(None)
+
+    def _flush_at_exit(self):
+        # The loop is gone by now, so this has to be written synchronously.
+        if self._pending:
+            self.backend.write(self.backend.prepare(self._db, self._pending))
+            self._pending = []
+
+    async def close(self):
+        """Writes anything still queued and releases the backend."""
+        if self.flush_interval is not None:
+            await self.flush()
+
+        # Saves that were already on their way, the flusher's included, hold
+        # or wait for the lock. The backend has to stay open until they're done.
+        with await self.lock:
+            pass
+
+        if self.flush_interval is not None:
+            # A failed save queues its changes again.
+            if self._pending:
+                await self.flush()
+            atexit.unregister(self._flush_at_exit)
+        if self._compaction is not None:
+            await self._compaction
+        if self._evictor is not None:
+            self._evictor.cancel()
+        self.backend.close()
+
+    def _fetch(self, key):
+        """Makes sure ``key`` is in memory if it exists at all."""
+        if not self.lazy:
+            return
+
+        self._last_used[key] = self.loop.time()
+        if key not in self._db and json_key(key) in self._stored:
+            # A lookup by primary key, cheap enough to not leave the loop for.
+            self._db[key] = self.backend.load_key(key)
+            self._reindex(key)
+
+    def _track(self, key, stored):
+        if self.lazy:
+            if stored:
+                self._stored.add(json_key(key))
+            else:
+                self._stored.discard(json_key(key))
+
+    async def _evict_idle(self):
+        while True:
+            await asyncio.sleep(self.evict_after)
+
+            # Anything being written or waiting to be has to stay.
+            if self.lock.locked():
+                continue
+            busy = {key[0] if op.endswith('_path') else key for op, key, value in self._pending}
+
+            deadline = self.loop.time() - self.evict_after
+            for key, last_used in list(self._last_used.items()):
+                if last_used < deadline and key not in busy:
+                    del self._last_used[key]
+                    self._db.pop(key, None)
+                    self._reindex(key)
 
     def get(self, key, *args):
+        self._fetch(key)
         return self._db.get(key, *args)
 
-    async def put(self, key, value, *args):
+    def create_index(self, name, func, *, nested=False):
+        """Declares an index, see :class:`Index` for what ``func`` has to return."""
+        index = self._indexes[name] = Index(func, nested)
+        index.rebuild(self._db)
+
+    def lookup(self, name, index_key, default=None):
+        """Returns the target stored under ``index_key`` in the index called ``name``."""
+        return self._indexes[name].entries.get(index_key, default)
+
+    def _reindex(self, key):
+        for index in self._indexes.values():
+            if key in self._db:
+                index.add(key, self._db[key])
+            else:
+                index.discard(key)
+
+    def _reindex_path(self, path):
+        """Like :meth:`_reindex`, but nested indexes only look at the member ``path`` leads into."""
+        key, member = path[0], path[1]
+        value = self._db.get(key)
+        for index in self._indexes.values():
+            if not index.nested:
+                if key in self._db:
+                    index.add(key, value)
+                else:
+                    index.discard(key)
+            elif isinstance(value, dict) and member in value:
+                index.add_member(key, member, value[member])
+            else:
+                index.discard_member(key, member)
+
+    async def put(self, key, value, *args, durable=False):
         """Edits a config entry."""
-        with await self.lock:
-            self._db[key] = value
-            await self.save()
+        self._fetch(key)
+        self._db[key] = value
+        self._track(key, True)
+        self._reindex(key)
+        flushed = await self._commit([('put', key, value)])
 
-    async def remove(self, key):
+        if durable and flushed is not None:
+            await asyncio.shield(flushed)
+
+    async def remove(self, key, *, durable=False):
         """Removes a config entry."""
-        with await self.lock:
-            del self._db[key]
-            await self.save()
+        self._fetch(key)
+        del self._db[key]
+        self._track(key, False)
+        self._reindex(key)
+        flushed = await self._commit([('remove', key, None)])
+
+        if durable and flushed is not None:
+            await asyncio.shield(flushed)
+
+    async def put_path(self, path, value, *, durable=False):
+        """Edits a nested config entry.
+
+        ``path`` is a tuple of dict keys starting with the top-level key,
+        e.g. ``('friend_codes', user_id)``. Missing dicts along the way are
+        created.
+        """
+        path = tuple(path)
+        if len(path) == 1:
+            return await self.put(path[0], value, durable=durable)
+
+        self._fetch(path[0])
+        set_path(self._db, path, value)
+        self._track(path[0], True)
+        self._reindex_path(path)
+        flushed = await self._commit([('put_path', path, value)])
+
+        if durable and flushed is not None:
+            await asyncio.shield(flushed)
+
+    async def remove_path(self, path, *, durable=False):
+        """Removes a nested config entry if it exists."""
+        path = tuple(path)
+        if len(path) == 1:
+            if path[0] in self:
+                await self.remove(path[0], durable=durable)
+            return
+
+        self._fetch(path[0])
+        pop_path(self._db, path)
+        self._reindex_path(path)
+        flushed = await self._commit([('remove_path', path, None)])
+
+        if durable and flushed is not None:
+            await asyncio.shield(flushed)
 
     def __contains__(self, item):
+        if self.lazy:
+            return json_key(item) in self._stored
         return self._db.__contains__(item)
 
     def __len__(self):
+        if self.lazy:
+            return len(self._stored)
         return self._db.__len__()
 
     def all(self):
-        return self._db
\ No newline at end of file
+        for key in list(self._stored):
+            self._fetch(key)
+        return self._db
+
+
+# The json databases used by the cogs and the SQLite files that replace them.
+MIGRATIONS = [
+    ('stars.json', 'stars.db'),
+    ('egl.json', 'egl.db'),
+    ('pokemon.json', 'pokemon.db'),
+    ('Config/logging.json', 'Config/logging.db'),
+    ('Dota/notable_players.json', 'Dota/notable_players.db'),
+]
+
+
+def migrate(source, destination, backend=SQLiteBackend, **options):
+    """Copies a json database, including an append-only log next to it, into ``backend``.
+
+    The copy is written next to ``destination`` and only moved there once
+    it is complete, so an interrupted migration is simply done again.
+    Returns the number of keys imported, or ``None`` if there was nothing to import.
+    """
+    if not os.path.exists(source):
+        return None
+
+    db = LogBackend(source, object_hook=options.get('object_hook')).load()
+    tmp_name = destination + '.migrating'
+    if os.path.exists(tmp_name):
+        os.remove(tmp_name)
+
+    target = backend(tmp_name, **options)
+    try:
+        target.write(target.prepare(db, [('put', key, value) for key, value in db.items()]))
+    finally:
+        target.close()
+    os.replace(tmp_name, destination)
+    return len(db)
+
+
+if __name__ == '__main__':
+    # The cogs migrate their own databases when they are first loaded. Run
+    # this from the bot's working directory to move everything over up front.
+    for source, destination in MIGRATIONS:
+        if os.path.exists(destination):
+            print('[Database] Skipping {0}, {1} already exists.'.format(source, destination))
+            continue
+        count = migrate(source, destination)
+        if count is None:
+            print('[Database] Skipping {0}, it does not exist.'.format(source))
+        else:
+            print('[Database] Migrated {0} keys from {1} to {2}.'.format(count, source, destination))
\ No newline at end of file
@@ -0,0 +1,86 @@
+import asyncio
+import traceback
+from collections import Counter
+
+
+class HedgedFetcher:
+    """Gets the same thing from whichever of several sources answers first.
+
+    ``sources`` maps names to coroutine functions that take the arguments
+    given to :meth:`fetch` and return the result, or ``None`` when they don't
+    have it. The source with the lowest average latency is asked first. If
+    it hasn't answered after ``hedge_after`` seconds, or has failed, the next
+    one is asked too, and the first proper answer wins.
+
+    Latencies are exponentially weighted moving averages. Failures count as
+    ``failure_penalty`` seconds so broken sources drop down the ranking.
+    """
+
+    def __init__(self, sources, *, hedge_after=0.5, alpha=0.2, failure_penalty=5.0, loop=None):
+        self.sources = sources
+        self.hedge_after = hedge_after
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.latency = {}
+        self.wins = Counter()
+        self.hedges = 0
+
+    def ranked(self):
+        # Sources without any timings yet go first so they get measured.
+        return sorted(self.sources, key=lambda name: self.latency.get(name, 0.0))
+
+    def observe(self, name, elapsed):
+        if name not in self.latency:
+            self.latency[name] = elapsed
+        else:
+            self.latency[name] += self.alpha * (elapsed - self.latency[name])
+
+    async def timed(self, name, *args):
+        start = self.loop.time()
+        try:
+            result = await self.sources[name](*args)
+        except asyncio.CancelledError:
+            # Lost the race, so it took at least this long.
+            self.observe(name, self.loop.time() - start)
+            raise
+        except:
+            print('[HedgedFetcher] {0} failed:'.format(name))
+            traceback.print_exc()
+            result = None
+
+        self.observe(name, self.loop.time() - start if result is not None else self.failure_penalty)
+        return result
+
+    async def fetch(self, *args):
+        waiting = self.ranked()
+        tasks = {}
+
+        def ask(name):
+            tasks[self.loop.create_task(self.timed(name, *args))] = name
+
+        ask(waiting.pop(0))
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(list(tasks), timeout=self.hedge_after if waiting else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    ask(waiting.pop(0))
+                    continue
+
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.result() is not None:
+                        self.wins[name] += 1
+                        return task.result()
+
+                # Everything asked so far came up empty, don't wait to ask the next.
+                if not tasks and waiting:
+                    ask(waiting.pop(0))
+
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
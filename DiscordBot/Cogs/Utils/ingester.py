@@ -0,0 +1,97 @@
+import asyncio
+import traceback
+
+from .event_emitter import EventEmitter
+from .ratelimit import LOW
+from .steamapi import SteamAPIUnavailable
+
+# Most matches GetMatchHistoryBySequenceNum returns per page.
+PAGE_SIZE = 100
+
+
+class MatchIngester(EventEmitter):
+    """Follows every match Steam finishes through GetMatchHistoryBySequenceNum.
+
+    Pages of matches are read in sequence number order, so the cost of
+    keeping up doesn't depend on how many players are watched. Matches with
+    a player whose dota id is in :attr:`watched` are emitted as a ``match``
+    event with the match (shaped like a GetMatchDetails ``result``) and the
+    set of watched dota ids that played in it, and kept in the match store
+    if there is one.
+
+    The next sequence number to read is kept in the ``state`` database, so a
+    restart carries on where the last run stopped. Without one the ingester
+    starts at the newest match.
+    """
+
+    def __init__(self, steam_api, state, *, match_store=None, idle_delay=10.0, error_delay=30.0):
+        super().__init__()
+        self.steam_api = steam_api
+        self.state = state
+        self.match_store = match_store
+        self.idle_delay = idle_delay
+        self.error_delay = error_delay
+
+        # Anything supporting ``in`` with dota ids, set by whoever runs this.
+        self.watched = set()
+        self.pages = 0
+        self.matches = 0
+        self.reported = 0
+
+    @property
+    def next_seq_num(self):
+        return self.state.get('next_seq_num')
+
+    async def head_seq_num(self):
+        """Returns the sequence number of the newest match Steam has."""
+        result = (await self.steam_api.get_match_history(matches_requested=1, priority=LOW))['result']
+        return result['matches'][0]['match_seq_num']
+
+    async def run(self):
+        print('[Ingester] Match ingester started at sequence number {0}'.format(self.next_seq_num))
+        while True:
+            try:
+                if self.next_seq_num is None:
+                    await self.state.put('next_seq_num', await self.head_seq_num())
+
+                full = await self.ingest_page()
+            except asyncio.CancelledError:
+                raise
+            except SteamAPIUnavailable as e:
+                print('[Ingester] Steam Web API unavailable: {0}'.format(e))
+                await asyncio.sleep(self.error_delay)
+                continue
+            except:
+                traceback.print_exc()
+                await asyncio.sleep(self.error_delay)
+                continue
+
+            # Keep reading while behind, otherwise wait for more matches to end.
+            if not full:
+                await asyncio.sleep(self.idle_delay)
+
+    async def ingest_page(self):
+        """Reads the next page of matches. Returns whether the page was full."""
+        response = await self.steam_api.get_match_history_by_seq_num(start_at_match_seq_num=self.next_seq_num,
+                                                                     matches_requested=PAGE_SIZE, priority=LOW)
+        result = response['result']
+        if result['status'] != 1:
+            raise ValueError('Steam refused the page: {0}'.format(result.get('statusDetail')))
+
+        matches = result['matches']
+        self.pages += 1
+        self.matches += len(matches)
+
+        for match in matches:
+            account_ids = {player.get('account_id') for player in match.get('players', [])}
+            account_ids = {account_id for account_id in account_ids if account_id in self.watched}
+            if account_ids:
+                self.reported += 1
+                if self.match_store is not None:
+                    self.match_store.put(match)
+                self.emit('match', match, account_ids)
+
+        if matches:
+            await self.state.put('next_seq_num', matches[-1]['match_seq_num'] + 1)
+
+        return len(matches) >= PAGE_SIZE
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import sqlite3
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Account id Steam uses for players hiding their profile.
+ANONYMOUS_ACCOUNT_ID = 4294967295
+
+
+class MatchStore:
+    """Keeps finished match details on disk.
+
+    Matches are stored as zlib compressed JSON in an SQLite database, keyed
+    by match id, with a second table listing the matches of every account.
+    All disk access happens on one worker thread so the event loop never
+    waits on it. Call :meth:`close` once the store is no longer needed.
+    """
+
+    def __init__(self, name, *, loop=None, level=6):
+        self.name = name
+        self.level = level
+        self.loop = loop or asyncio.get_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Only ever used from the executor's thread.
+        self.connection = sqlite3.connect(self.name, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS matches '
+                                '(match_id INTEGER PRIMARY KEY, start_time INTEGER, data BLOB NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS players (account_id INTEGER NOT NULL, '
+                                'match_id INTEGER NOT NULL, PRIMARY KEY (account_id, match_id)) WITHOUT ROWID')
+        self.connection.commit()
+
+    @staticmethod
+    def finished(match):
+        # GetMatchDetails only knows about matches that are over, but make
+        # sure this is a real one before keeping it forever.
+        return isinstance(match, dict) and 'match_id' in match and 'radiant_win' in match and 'error' not in match
+
+    async def get(self, match_id):
+        """Returns the stored ``result`` dict of a match, or ``None``."""
+        return await self.loop.run_in_executor(self.executor, self.read, int(match_id))
+
+    async def account_matches(self, account_id, limit=20):
+        """Returns the ids of stored matches of an account, newest first."""
+        return await self.loop.run_in_executor(self.executor, self.read_account, int(account_id), limit)
+
+    def put(self, match):
+        """Stores a match from the ``result`` of a GetMatchDetails response in the background.
+
+        Returns a future for the write, which doesn't need to be awaited.
+        """
+        if not self.finished(match):
+            return None
+
+        # Encoded on the loop so the dict can't change while it's written.
+        data = zlib.compress(json.dumps(match, ensure_ascii=True, separators=(',', ':')).encode(), self.level)
+        accounts = {player['account_id'] for player in match.get('players', [])
+                    if player.get('account_id', ANONYMOUS_ACCOUNT_ID) != ANONYMOUS_ACCOUNT_ID}
+
+        future = self.loop.run_in_executor(self.executor, self.write, match['match_id'], match.get('start_time'),
+                                           data, accounts)
+        future.add_done_callback(self.write_done)
+        return future
+
+    @staticmethod
+    def write_done(future):
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            print('[MatchStore] Failed to store a match:')
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def read(self, match_id):
+        row = self.connection.execute('SELECT data FROM matches WHERE match_id = ?', (match_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode())
+
+    def read_account(self, account_id, limit):
+        rows = self.connection.execute('SELECT match_id FROM players WHERE account_id = ? '
+                                       'ORDER BY match_id DESC LIMIT ?', (account_id, limit))
+        return [match_id for match_id, in rows]
+
+    def write(self, match_id, start_time, data, accounts):
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO matches VALUES (?, ?, ?)', (match_id, start_time, data))
+            self.connection.executemany('INSERT OR IGNORE INTO players VALUES (?, ?)',
+                                        [(account_id, match_id) for account_id in accounts])
+
+    def close(self):
+        # Lets queued writes finish first.
+        self.executor.shutdown(wait=True)
+        self.connection.close()
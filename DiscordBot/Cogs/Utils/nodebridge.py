@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+
+
+class NodeUnavailable(Exception):
+    """Raised when the Node bridge can't be reached or the connection to it drops."""
+    pass
+
+
+class NodeError(Exception):
+    """Raised when the Node bridge answers a call with an error."""
+    pass
+
+
+class NodeBridge:
+    """Asyncio client for the JSON lines socket of Node/mt5abot-node.js.
+
+    It exposes the methods the bridge serves. Each request is one
+    line of ``{"id": ..., "method": ..., "args": [...]}`` and each reply one
+    line of ``{"id": ..., "error": ..., "result": ...}``, so any number of
+    calls can share the connection and replies may come back in any order.
+
+    Calls wait at most ``timeout`` seconds, or their own ``timeout``, after
+    which they raise :exc:`asyncio.TimeoutError`. A call that times out or
+    is cancelled just forgets its id and the late reply is dropped. The
+    timeout is sent along too, so the bridge doesn't start on calls still in
+    its queues that nobody is waiting for anymore.
+    """
+
+    def __init__(self, host='127.0.0.1', port=4243, *, timeout=10.0, loop=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.connecting = asyncio.Lock()
+        self.reader = None
+        self.writer = None
+        self.reading = None
+
+    @property
+    def connected(self):
+        return self.writer is not None
+
+    async def connect(self):
+        with await self.connecting:
+            if self.writer is not None:
+                return
+            try:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                raise NodeUnavailable('Could not connect to the Node bridge: {0}'.format(e)) from e
+            self.reading = self.loop.create_task(self.read_replies(self.reader))
+
+    async def read_replies(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    reply = json.loads(line.decode())
+                except ValueError:
+                    print('[NodeBridge] Bad reply: {0!r}'.format(line))
+                    continue
+
+                future = self.pending.pop(reply.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if reply.get('error') is not None:
+                    future.set_exception(NodeError(reply['error']))
+                else:
+                    future.set_result(reply.get('result'))
+        except OSError as e:
+            print('[NodeBridge] Lost the connection: {0}'.format(e))
+        finally:
+            if self.reader is reader:
+                self.disconnect()
+
+    def disconnect(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(NodeUnavailable('Lost the connection to the Node bridge'))
+
+    def close(self):
+        if self.reading is not None:
+            self.reading.cancel()
+        self.disconnect()
+
+    async def call(self, method, *args, timeout=None):
+        """Calls ``method`` on the bridge and returns what it replies."""
+        timeout = timeout or self.timeout
+        await self.connect()
+
+        id_ = next(self.ids)
+        future = self.loop.create_future()
+        self.pending[id_] = future
+        request = {'id': id_, 'method': method, 'args': args, 'timeout': int(timeout * 1000)}
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(id_, None)
+
+    ################################
+    # General functions
+    ################################
+
+    async def hello(self, name='MT5ABot', **kwargs):
+        return await self.call('hello', name, **kwargs)
+
+    ################################
+    # Dota 2 general functions
+    ################################
+
+    async def status(self, **kwargs):
+        return await self.call('status', **kwargs)
+
+    async def gc_status(self, **kwargs):
+        return await self.call('gc_status', **kwargs)
+
+    async def queue_stats(self, **kwargs):
+        """Returns ``{queue: stats}`` for the request queues of the bridge. Wait times are in ms."""
+        return await self.call('queue_stats', **kwargs)
+
+    async def cache_stats(self, **kwargs):
+        """Returns ``{cache: stats}`` for the caches of the bridge."""
+        return await self.call('cache_stats', **kwargs)
+
+    async def get_profile_card(self, dotaid, fresh=False, **kwargs):
+        """Gets a Dota profile card. ``fresh`` skips the bridge's profile card cache."""
+        card = await self.call('get_profile_card', str(dotaid), fresh, **kwargs)
+        return json.loads(card) if card else None
+
+    async def get_match_details(self, match_id, **kwargs):
+        """Gets a match from the Dota GC, shaped like a GetMatchDetails result. None if the GC doesn't have it."""
+        match = await self.call('get_match_details', str(match_id), **kwargs)
+        return json.loads(match) if match else None
+
+    #########################
+    # MMR functions
+    #########################
+
+    async def get_mmr_for_dotaid(self, dotaid, fresh=False, **kwargs):
+        return await self.call('get_mmr_for_dotaid', str(dotaid), fresh, **kwargs)
+
+    async def get_mmr_for_dotaids(self, dotaids, fresh=False, **kwargs):
+        """Gets the MMRs of many accounts in one call.
+
+        Returns ``{dotaid: (solo, party)}``, with ``None`` for accounts whose
+        profile card couldn't be fetched, or ``None`` if the GC isn't ready.
+        Cached profile cards are used unless ``fresh`` is set.
+        """
+        mmrs = await self.call('get_mmr_for_dotaids', [str(dotaid) for dotaid in dotaids], fresh, **kwargs)
+        if mmrs is False:
+            return None
+        return {int(dotaid): tuple(mmr) if mmr is not None else None for dotaid, mmr in mmrs.items()}
+
+    #########################
+    # Verification functions
+    #########################
+
+    async def verify_code(self, discordid, code, **kwargs):
+        return await self.call('verify_check', discordid, code, **kwargs)
+
+    async def delete_key(self, discordid, **kwargs):
+        return await self.call('delete_key', discordid, **kwargs)
+
+    async def add_pending_discord_link(self, steamid, discordid, **kwargs):
+        return await self.call('add_pending_discord_link', steamid, discordid, **kwargs)
+
+    async def remove_pending_discord_link(self, steamid, **kwargs):
+        return await self.call('del_pending_discord_link', steamid, **kwargs)
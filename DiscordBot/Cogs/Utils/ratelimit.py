@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import deque
+
+# Request priorities, lower goes first. HIGH is for things users are
+# waiting on and LOW for background polling and bulk jobs.
+HIGH = 0
+LOW = 1
+
+LANES = {HIGH: 'high', LOW: 'low'}
+
+
+class RateLimiter:
+    """Token bucket that lets requests through at ``rate`` per second.
+
+    Up to ``burst`` requests go through at once after a quiet spell. Anything
+    over that waits in the lane for its priority, and waiting high priority
+    requests are always let through before low priority ones. Queue depth and
+    how long recent requests waited are available from :meth:`stats`.
+    """
+
+    def __init__(self, rate=5.0, burst=10, *, loop=None, timer=time.monotonic, history=1000):
+        self.rate = rate
+        self.burst = burst
+        self.loop = loop or asyncio.get_event_loop()
+        self.timer = timer
+
+        self.tokens = float(burst)
+        self.updated = timer()
+        self.lanes = {priority: deque() for priority in LANES}
+        self.waits = {priority: deque(maxlen=history) for priority in LANES}
+        self.served = {priority: 0 for priority in LANES}
+        self._wakeup = None
+
+    async def acquire(self, priority=HIGH):
+        self.refill()
+        # Only skip the queue when nothing as important is already waiting.
+        if self.tokens >= 1 and not any(self.lanes[p] for p in LANES if p <= priority):
+            self.tokens -= 1
+            self.record(priority, 0.0)
+            return
+
+        waiter = self.loop.create_future()
+        self.lanes[priority].append((waiter, self.timer()))
+        self.schedule()
+        await waiter
+
+    def refill(self):
+        now = self.timer()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def schedule(self):
+        if self._wakeup is None:
+            delay = max(1 - self.tokens, 0) / self.rate
+            self._wakeup = self.loop.call_later(delay, self.release)
+
+    def release(self):
+        self._wakeup = None
+        self.refill()
+
+        for priority in sorted(LANES):
+            lane = self.lanes[priority]
+            while lane and self.tokens >= 1:
+                waiter, queued = lane.popleft()
+                # Skip requests that were cancelled while they waited.
+                if waiter.done():
+                    continue
+                self.tokens -= 1
+                self.record(priority, self.timer() - queued)
+                waiter.set_result(None)
+
+        if any(self.lanes.values()):
+            self.schedule()
+
+    def record(self, priority, waited):
+        self.served[priority] += 1
+        self.waits[priority].append(waited)
+
+    def stats(self):
+        """Returns ``{lane: {'queued', 'served', 'wait_avg', 'wait_max'}}`` with waits in seconds."""
+        stats = {}
+        for priority, name in LANES.items():
+            waits = self.waits[priority]
+            stats[name] = {
+                'queued': sum(1 for waiter, _ in self.lanes[priority] if not waiter.done()),
+                'served': self.served[priority],
+                'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+                'wait_max': max(waits) if waits else 0.0,
+            }
+        return stats
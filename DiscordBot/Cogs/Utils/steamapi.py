@@ -1,8 +1,43 @@
+import asyncio
+import random
 import re
 
-import requests
+import aiohttp
 
 from . import urls
+from .breaker import CircuitBreaker
+from .cache import TTLCache
+from .ratelimit import HIGH, LANES, LOW, RateLimiter
+from .usage import UsageTracker
+
+# How long responses are cached for, in seconds, and how many are kept per
+# endpoint. Endpoints missing here always go over the network. Details are
+# only ever returned for finished matches, which never change.
+CACHE_POLICIES = {
+    urls.GET_MATCH_DETAILS: (7 * 24 * 60 * 60, 2048),
+    urls.GET_HEROES: (6 * 60 * 60, 4),
+    urls.GET_GAME_ITEMS: (6 * 60 * 60, 4),
+    urls.GET_LEAGUE_LISTING: (60 * 60, 4),
+    urls.GET_TEAM_INFO_BY_TEAM_ID: (60 * 60, 256),
+    urls.GET_TOURNAMENT_PRIZE_POOL: (5 * 60, 64),
+    urls.GET_PLAYER_SUMMARIES: (5 * 60, 1024),
+    urls.GET_MATCH_HISTORY: (30, 512),
+}
+
+# The most steamids GetPlayerSummaries takes in one call.
+SUMMARIES_PER_REQUEST = 100
+
+# ResolveVanityURL's success code for names nobody has.
+VANITY_NO_MATCH = 42
+
+NOT_CACHED = object()
+
+STEAM_ID2 = re.compile(r'STEAM_[0-5]:([01]):(\d+)$')
+STEAM_ID3 = re.compile(r'\[U:1:(\d+)\]$')
+PROFILE_URL = re.compile(r'steamcommunity\.com/profiles/(\d+)')
+VANITY_URL = re.compile(r'steamcommunity\.com/id/([^/?#\s]+)')
+DOTABUFF_URL = re.compile(r'dotabuff\.com/players/(\d+)')
+NUMBER = re.compile(r'\d+$')
 
 
 class ID(object):
@@ -38,142 +73,505 @@ class ID(object):
         return int(ID_) + cls.STEAM_TO_DOTA_CONSTANT
 
 
-class SteamAPI:
-    # https://wiki.teamfortress.com/wiki/WebAPI
-    # https://developer.valvesoftware.com/wiki/Steam_Web_API
-    # http://dev.dota2.com/showthread.php?t=58317
-    def __init__(self, api_key, attempts=1):
-        self.steam_api_key = api_key
-        self.api_attempts = attempts
-
-    def get_api_call(self, api_path, **args):
-        api_call = urls.BASE_URL + api_path + '?key=%s' % self.steam_api_key
-
-        raw_request = False
-
-        for key in args:
-            if key == 'raw_request':
-                raw_request = args[key]
-                continue
-
-            api_call += '&%s=%s' % (key, args[key])
-
-        json = {}
-        attempts = 0
-        request_data = None
-
-        while json == {} and attempts < self.api_attempts:
-            attempts += 1
-            request_data = requests.get(api_call, timeout=4)
-
-            if request_data.status_code not in [200, 503]:
-                print('[SteamAPI] API call failure:', request_data, request_data.reason, api_path.split('/')[-3:-2])
-
-            json = request_data.json()
-
-        return json if not raw_request else request_data
-
-    def get_league_listing(self, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
-
-        return self.get_api_call(urls.GET_LEAGUE_LISTING, **args)
+def parse_steam_id(steamthing):
+    """Works out a Steam ID without asking Steam.
 
-    def get_live_league_games(self, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    Understands SteamID2 and SteamID3, profile, vanity and Dotabuff URLs and
+    bare Steam or Dota IDs. Anything else is taken as a vanity name. Returns
+    ``(steam_id, None)`` when the ID is known, ``(None, name)`` when the vanity
+    name still has to be resolved and ``(None, None)`` when there is no ID.
+    """
+    steamthing = str(steamthing).strip()
 
-        return self.get_api_call(urls.GET_LIVE_LEAGUE_GAMES, **args)
+    match = STEAM_ID2.match(steamthing)
+    if match:
+        return int(match.group(2)) * 2 + int(match.group(1)) + ID.STEAM_TO_DOTA_CONSTANT, None
 
-    def get_match_details(self, match_id=None, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    match = STEAM_ID3.match(steamthing)
+    if match:
+        return ID.dota_to_steam(match.group(1)), None
 
-        return self.get_api_call(urls.GET_MATCH_DETAILS, **args)
+    match = PROFILE_URL.search(steamthing)
+    if match:
+        return int(match.group(1)), None
 
-    def get_match_history(self,
-                          hero_id=None, game_mode=None, skill=None, min_players=None,
-                          account_id=None, league_id=None, start_at_match_id=None,
-                          matches_requested=None, tournament_games_only=None, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    match = VANITY_URL.search(steamthing)
+    if match:
+        return None, match.group(1)
 
-        return self.get_api_call(urls.GET_MATCH_HISTORY, **args)
+    # Dotabuff uses Dota IDs, bare numbers can be either.
+    match = DOTABUFF_URL.search(steamthing)
+    number = match.group(1) if match else steamthing if NUMBER.match(steamthing) else None
+    if number is not None:
+        number = int(number)
+        if number == 0 or number == ID.STEAM_TO_DOTA_CONSTANT:
+            return None, None
+        return ID(number).steam_id, None
 
-    def get_match_history_by_seq_num(self, start_at_match_seq_num=None, matches_requested=None, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    if not steamthing or '/' in steamthing:
+        return None, None
+    return None, steamthing
 
-        return self.get_api_call(urls.GET_MATCH_HISTORY_BY_SEQ_NUM, **args)
 
-    def get_team_info_by_team_id(self, start_at_team_id=None, teams_requested=None, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+class SteamAPIUnavailable(Exception):
+    """Raised when a Steam Web API endpoint can't be reached or keeps failing."""
+    pass
 
-        return self.get_api_call(urls.GET_TEAM_INFO_BY_TEAM_ID, **args)
 
-    def get_heroes(self, language='en_us', raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
-
-        return self.get_api_call(urls.GET_HEROES, **args)
-
-    def get_game_items(self, language='en_us', raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+class SteamAPI:
+    """Asynchronous Steam Web API client.
+
+    Every endpoint method is a coroutine. Requests share one aiohttp session,
+    so connections are kept alive and reused between calls, and each request
+    gives up after ``timeout`` seconds. Call :meth:`close` once the client is
+    no longer needed.
+
+    Responses are cached per endpoint as described by ``cache_policies``,
+    which defaults to :data:`CACHE_POLICIES`. Cached responses are shared
+    between callers, so don't modify them. Concurrent identical calls are
+    coalesced into one request, but high priority calls never wait on a low
+    priority one. Raw requests are neither cached nor coalesced.
+
+    Player summaries are cached per steamid and the ids asked for by
+    concurrent :meth:`get_player_summaries` calls share upstream requests.
+
+    Requests are let out at ``rate`` per second, in bursts of up to ``burst``,
+    by :attr:`limiter`. Every endpoint method takes a ``priority``; pass
+    :data:`LOW` for background work so it waits behind user commands.
+
+    Each endpoint has a :class:`CircuitBreaker`. Once ``breaker_failures``
+    calls in a row fail, calls to it raise :exc:`SteamAPIUnavailable` straight
+    away until a probe gets through, which is tried every ``breaker_reset``
+    seconds. Failed attempts are retried up to ``attempts`` times with jittered
+    exponential backoff, and when ``hedge_after`` is set, an attempt that
+    hasn't answered after that many seconds is raced against a second copy.
+
+    Every request sent is recorded in :attr:`usage` by endpoint and priority
+    lane, to keep an eye on the ``daily_limit`` Valve allows.
+
+    Vanity names are cached for ``vanity_ttl`` seconds, and names nobody
+    has for ``vanity_miss_ttl``.
+
+    Given a :class:`~.matchstore.MatchStore`, match details are looked up in
+    it before asking Steam and every finished match fetched is saved to it.
+    """
+    # https://wiki.teamfortress.com/wiki/WebAPI
+    # https://developer.valvesoftware.com/wiki/Steam_Web_API
+    # http://dev.dota2.com/showthread.php?t=58317
+    def __init__(self, api_key, attempts=1, *, loop=None, timeout=4, connections=20, cache_policies=None,
+                 batch_window=0.005, rate=5.0, burst=10, breaker_failures=3, breaker_reset=30.0,
+                 backoff_base=0.25, backoff_max=4.0, hedge_after=None, match_store=None, base_url=urls.BASE_URL,
+                 vanity_ttl=24 * 60 * 60, vanity_miss_ttl=10 * 60, daily_limit=100000):
+        self.steam_api_key = api_key
+        self.base_url = base_url
+        self.api_attempts = attempts
+        self.timeout = timeout
+        self.loop = loop or asyncio.get_event_loop()
+        self.limiter = RateLimiter(rate, burst, loop=self.loop)
+        self.usage = UsageTracker(daily_limit)
+
+        self.breakers = {}
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.hedged = 0
+        self.match_store = match_store
+
+        if cache_policies is None:
+            cache_policies = CACHE_POLICIES
+        self.caches = {api_path: TTLCache(maxsize, ttl) for api_path, (ttl, maxsize) in cache_policies.items()}
+        self.vanity_cache = TTLCache(4096, vanity_ttl)
+        self.vanity_miss_ttl = vanity_miss_ttl
+
+        # Requests on their way keyed by endpoint, arguments and lane, and how many
+        # calls were answered by one of them instead of their own request.
+        self.in_flight = {}
+        self.coalesced = 0
+
+        # Player summaries wanted within batch_window seconds of each other are
+        # fetched together. summary_batches maps each steamid to the batch
+        # task fetching it and open_batch takes new ids until it's sent.
+        self.batch_window = batch_window
+        self.summary_batches = {}
+        self.summary_priorities = {}
+        self.open_batch = None
+        self.open_batch_ids = []
+
+        connector = aiohttp.TCPConnector(limit=connections, loop=self.loop)
+        self.session = aiohttp.ClientSession(connector=connector, loop=self.loop,
+                                             headers={'Accept-Encoding': 'gzip'})
+
+    def close(self):
+        self.session.close()
+
+    def cache_stats(self):
+        """Returns a ``{endpoint: (hits, misses, cached)}`` dict."""
+        return {self.endpoint_name(api_path): (cache.hits, cache.misses, len(cache))
+                for api_path, cache in self.caches.items()}
+
+    def clear_cache(self, api_path=None):
+        """Forgets cached responses for one endpoint, or for all of them."""
+        for path, cache in self.caches.items():
+            if api_path is None or path == api_path:
+                cache.clear()
+
+    @staticmethod
+    def endpoint_name(api_path):
+        return api_path.split('/')[-3]
+
+    @staticmethod
+    def cacheable(json):
+        # Empty bodies are failures and errors like an unknown match id can go
+        # away, so only keep proper answers.
+        if not json:
+            return False
+        result = json.get('result')
+        return not (isinstance(result, dict) and 'error' in result)
+
+    @staticmethod
+    def format_arg(value):
+        # Steam wants lists comma separated and booleans as numbers.
+        if isinstance(value, (list, tuple, set)):
+            return ','.join(str(v) for v in value)
+        if isinstance(value, bool):
+            return str(int(value))
+        return str(value)
+
+    async def get_api_call(self, api_path, **args):
+        raw_request = args.pop('raw_request', False)
+        priority = args.pop('priority', HIGH)
+
+        params = {}
+        for key in args:
+            params[key] = self.format_arg(args[key])
+
+        if raw_request:
+            return (await self.request(api_path, params, priority))[1]
+
+        key = tuple(sorted(params.items()))
+        cache = self.caches.get(api_path)
+        if cache is not None:
+            json = cache.get(key)
+            if json is not None:
+                return json
+
+        # Identical calls made while one is on its way share its result. The
+        # shield keeps one caller giving up from cancelling it for the rest.
+        # Calls only join ones queued in the same or a more urgent lane, so
+        # a user never ends up waiting behind a background job's call.
+        task = None
+        for lane in sorted(LANES):
+            if lane > priority:
+                break
+            task = self.in_flight.get((api_path, key, lane))
+            if task is not None:
+                break
+
+        if task is None:
+            flight = (api_path, key, priority)
+            task = self.loop.create_task(self.fetch(api_path, params, cache, key, priority))
+            task.add_done_callback(lambda _: self.in_flight.pop(flight, None))
+            self.in_flight[flight] = task
+        else:
+            self.coalesced += 1
 
-        return self.get_api_call(urls.GET_GAME_ITEMS, **args)
+        return await asyncio.shield(task)
 
-    def get_tournament_prize_pool(self, leagueid=None):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    async def fetch(self, api_path, params, cache, key, priority):
+        store = None
+        if api_path == urls.GET_MATCH_DETAILS and params.get('match_id', '').isdigit():
+            store = self.match_store
+        match = await store.get(params['match_id']) if store is not None else None
 
-        return self.get_api_call(urls.GET_TOURNAMENT_PRIZE_POOL, **args)
+        if match is not None:
+            json = {'result': match}
+        else:
+            json = (await self.request(api_path, params, priority))[0]
+            if store is not None and self.cacheable(json):
+                store.put(json['result'])
 
-    def get_player_summaries(self, steamids, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+        if cache is not None and self.cacheable(json):
+            cache.put(key, json)
 
-        return self.get_api_call(urls.GET_PLAYER_SUMMARIES, **args)
+        return json
 
-    def resolve_vanity_url(self, vanityurl, raw_request=False):
-        args = {k: v for k, v in locals().items() if v is not None and k is not 'self'}
+    def breaker(self, api_path):
+        breaker = self.breakers.get(api_path)
+        if breaker is None:
+            breaker = self.breakers[api_path] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return breaker
 
-        return self.get_api_call(urls.RESOLVE_VANITY_URL, **args)
+    def backoff(self, attempt):
+        # Full jitter, so retries from many callers don't arrive together.
+        return random.uniform(0, min(self.backoff_base * 2 ** attempt, self.backoff_max))
 
-    # Gets a Steam ID from something. Returns None if it couldn't figure it out.
-    def determine_steam_id(self, steamthing):
-        steamthing = str(steamthing)
+    async def request(self, api_path, params, priority=HIGH):
+        breaker = self.breaker(api_path)
+        if not breaker.allow():
+            raise SteamAPIUnavailable('{0} is failing, retrying in {1:.0f}s'.format(
+                self.endpoint_name(api_path), breaker.retry_in()))
 
-        if steamthing.startswith('STEAM_'):
-            sx, sy, sz = steamthing.split('_')[1].split(':')
-            maybesteamid = (int(sz) * 2 + int(sy)) + ID.STEAM_TO_DOTA_CONSTANT
+        params = dict(params, key=self.steam_api_key)
+        error = None
 
-        elif 'steamcommunity.com/profiles/' in steamthing:
-            maybesteamid = [x for x in steamthing.split('/') if x][-1]
+        for attempt in range(self.api_attempts):
+            if attempt:
+                await asyncio.sleep(self.backoff(attempt - 1))
 
-        elif 'steamcommunity.com/id/' in steamthing:
+            await self.limiter.acquire(priority)
             try:
-                result = self.resolve_vanity_url([x for x in steamthing.split('/') if x][-1])['response']
-            except:
-                return False
-
-            if result['success'] == 1:
-                maybesteamid = result['steamid']
-            else:
-                maybesteamid = None
+                request_data, json = await self.attempt(api_path, params, priority)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                continue
 
-        elif 'dotabuff.com/players/' in steamthing:
-            match = re.search(r'/players/(\d+)', steamthing)
-            if match:
-                maybesteamid = ID(match.groups()[0]).steam_id
+            if request_data.status < 500:
+                breaker.success()
+                return json, request_data
+
+            error = None
+
+        breaker.failure()
+        if error is not None:
+            raise SteamAPIUnavailable('{0} failed: {1!r}'.format(self.endpoint_name(api_path), error)) from error
+        raise SteamAPIUnavailable('{0} failed: {1} {2}'.format(self.endpoint_name(api_path), request_data.status,
+                                                                request_data.reason))
+
+    async def attempt(self, api_path, params, priority):
+        if self.hedge_after is None:
+            return await self.send(api_path, params, priority)
+
+        # Send a second copy if the first is slow and use whichever answers first.
+        tasks = [self.loop.create_task(self.send(api_path, params, priority))]
+        acquire = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                # The hedge waits for its own token, but the first request may
+                # still answer while it's queued. Its place is given up below.
+                acquire = self.loop.create_task(self.limiter.acquire(priority))
+                await asyncio.wait([tasks[0], acquire], return_when=asyncio.FIRST_COMPLETED)
+                if acquire.done() and not tasks[0].done():
+                    self.hedged += 1
+                    tasks.append(self.loop.create_task(self.send(api_path, params, priority)))
+
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None or not tasks:
+                        return task.result()
+        finally:
+            # Nothing if the hedge got its token, otherwise leaves the queue.
+            if acquire is not None:
+                acquire.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def send(self, api_path, params, priority=HIGH):
+        usage_key = (self.endpoint_name(api_path), LANES[priority])
+        start = self.loop.time()
+        try:
+            with aiohttp.Timeout(self.timeout):
+                async with self.session.get(self.base_url + api_path, params=params) as request_data:
+                    if request_data.status not in [200, 503]:
+                        print('[SteamAPI] API call failure:', request_data.status, request_data.reason,
+                              api_path.split('/')[-3:-2])
+
+                    # Read inside the block so the body stays around for raw requests.
+                    body = await request_data.read()
+                    try:
+                        json = await request_data.json()
+                    except (ValueError, aiohttp.ClientResponseError):
+                        # Error pages are HTML.
+                        json = {}
+        except asyncio.CancelledError:
+            # Requests count against the budget whether they worked or not,
+            # but one given up on, like the slower copy of a hedged request,
+            # didn't fail.
+            self.usage.record(usage_key, None, self.loop.time() - start)
+            raise
+        except Exception as e:
+            self.usage.record(usage_key, type(e).__name__, self.loop.time() - start)
+            raise
+
+        # Count what came over the wire rather than the decompressed body,
+        # which is only the best guess for chunked responses.
+        size = request_data.headers.get('Content-Length')
+        size = int(size) if size is not None and size.isdigit() else len(body)
+        self.usage.record(usage_key, request_data.status, self.loop.time() - start, size)
+        return request_data, json
+
+    async def get_league_listing(self, raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_LEAGUE_LISTING, **args)
+
+    async def get_live_league_games(self, raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_LIVE_LEAGUE_GAMES, **args)
+
+    async def get_match_details(self, match_id=None, raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_MATCH_DETAILS, **args)
+
+    async def get_match_history(self,
+                                hero_id=None, game_mode=None, skill=None, min_players=None,
+                                account_id=None, league_id=None, start_at_match_id=None,
+                                matches_requested=None, tournament_games_only=None, raw_request=False,
+                                priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_MATCH_HISTORY, **args)
+
+    async def get_match_history_by_seq_num(self, start_at_match_seq_num=None, matches_requested=None,
+                                           raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_MATCH_HISTORY_BY_SEQ_NUM, **args)
+
+    async def get_team_info_by_team_id(self, start_at_team_id=None, teams_requested=None, raw_request=False,
+                                       priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_TEAM_INFO_BY_TEAM_ID, **args)
+
+    async def get_heroes(self, language='en_us', raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_HEROES, **args)
+
+    async def get_game_items(self, language='en_us', raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_GAME_ITEMS, **args)
+
+    async def get_tournament_prize_pool(self, leagueid=None, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.GET_TOURNAMENT_PRIZE_POOL, **args)
+
+    async def get_player_summaries(self, steamids, raw_request=False, priority=HIGH):
+        if raw_request:
+            return await self.get_api_call(urls.GET_PLAYER_SUMMARIES, steamids=steamids, raw_request=True,
+                                           priority=priority)
+
+        if not isinstance(steamids, (list, tuple, set)):
+            steamids = str(steamids).split(',')
+
+        cache = self.caches.get(urls.GET_PLAYER_SUMMARIES)
+        players = []
+        missing = set()
+        for steam_id in map(str, steamids):
+            player = cache.get(steam_id) if cache is not None else None
+            if player is not None:
+                players.append(player)
             else:
-                maybesteamid = None
+                missing.add(steam_id)
+
+        for batch in {self.queue_summary(steam_id, priority) for steam_id in missing}:
+            json = await asyncio.shield(batch)
+            if 'response' not in json:
+                # Failed, hand back what Steam said like any other call.
+                return json
+
+            players.extend(player for player in json['response']['players'] if player['steamid'] in missing)
+
+        return {'response': {'players': players}}
+
+    def queue_summary(self, steam_id, priority=HIGH):
+        # A batch goes out at the highest priority any of its callers asked for.
+        self.summary_priorities[steam_id] = min(priority, self.summary_priorities.get(steam_id, LOW))
+
+        batch = self.summary_batches.get(steam_id)
+        if batch is not None:
+            return batch
+
+        if self.open_batch is None or len(self.open_batch_ids) == SUMMARIES_PER_REQUEST:
+            self.open_batch_ids = []
+            self.open_batch = self.loop.create_task(self.fetch_summaries(self.open_batch_ids))
+
+        self.open_batch_ids.append(steam_id)
+        self.summary_batches[steam_id] = self.open_batch
+        return self.open_batch
+
+    async def fetch_summaries(self, steam_ids):
+        try:
+            # Give concurrent callers a moment to add their ids to this batch.
+            await asyncio.sleep(self.batch_window)
+            if self.open_batch_ids is steam_ids:
+                self.open_batch = None
+
+            priority = min(self.summary_priorities[steam_id] for steam_id in steam_ids)
+            json = (await self.request(urls.GET_PLAYER_SUMMARIES, {'steamids': ','.join(steam_ids)}, priority))[0]
+        finally:
+            for steam_id in steam_ids:
+                self.summary_batches.pop(steam_id, None)
+                self.summary_priorities.pop(steam_id, None)
+
+        cache = self.caches.get(urls.GET_PLAYER_SUMMARIES)
+        if cache is not None and 'response' in json:
+            for player in json['response']['players']:
+                cache.put(player['steamid'], player)
+
+        return json
+
+    async def resolve_vanity_url(self, vanityurl, raw_request=False, priority=HIGH):
+        args = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+
+        return await self.get_api_call(urls.RESOLVE_VANITY_URL, **args)
+
+    async def resolve_vanity_name(self, name, priority=HIGH):
+        """Returns the Steam ID of a vanity URL name, or ``None`` if there is none."""
+        steam_id = self.vanity_cache.get(name, NOT_CACHED)
+        if steam_id is not NOT_CACHED:
+            return steam_id
+
+        response = (await self.resolve_vanity_url(name, priority=priority))['response']
+        if response['success'] == 1:
+            steam_id = int(response['steamid'])
+            self.vanity_cache.put(name, steam_id)
+            return steam_id
+
+        if response['success'] == VANITY_NO_MATCH:
+            # Names can be claimed later, so misses aren't kept as long.
+            self.vanity_cache.put(name, None, self.vanity_miss_ttl)
+        return None
+
+    async def resolve_steam_ids(self, steamthings, priority=HIGH):
+        """Works out the Steam IDs of many identifiers in one go.
+
+        Takes anything :func:`parse_steam_id` understands and returns a dict
+        mapping every identifier, as a string, to its 64 bit Steam ID or to
+        ``None`` if it couldn't be worked out. Only vanity names cost a
+        request, and those are all resolved at the same time.
+        """
+        steam_ids = {}
+        vanity_names = {}
+        for steamthing in map(str, steamthings):
+            steam_id, name = parse_steam_id(steamthing)
+            steam_ids[steamthing] = steam_id
+            if name is not None:
+                vanity_names.setdefault(name, []).append(steamthing)
+
+        names = list(vanity_names)
+        results = await asyncio.gather(*[self.resolve_vanity_name(name, priority) for name in names],
+                                       return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print('[SteamAPI] Failed to resolve vanity name {0}: {1!r}'.format(name, result))
+                result = None
+            for steamthing in vanity_names[name]:
+                steam_ids[steamthing] = result
+
+        return steam_ids
 
-        else:
-            match = re.match(r'\d*$', steamthing)
-            if match:
-                maybesteamid = ID(match.string).steam_id
-            else:
-                try:
-                    result = self.resolve_vanity_url(steamthing)['response']
-                except:
-                    return False
-
-                if result['success'] == 1:
-                    maybesteamid = result['steamid']
-                else:
-                    maybesteamid = None
-
-        print('[SteamAPI] Determined that steamid for %s is %s' % (steamthing, maybesteamid))
-        return int(maybesteamid)
\ No newline at end of file
+    # Gets a Steam ID from something. Returns None if it couldn't figure it out.
+    async def determine_steam_id(self, steamthing):
+        steamid = (await self.resolve_steam_ids([steamthing]))[str(steamthing)]
+        print('[SteamAPI] Determined that steamid for %s is %s' % (steamthing, steamid))
+        return steamid
@@ -0,0 +1,107 @@
+import datetime
+import time
+from collections import Counter, deque
+
+# Upper bounds in seconds of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
+
+
+class Bucket:
+    """Calls made during one slice of time."""
+
+    def __init__(self, start=0):
+        self.start = start
+        self.calls = 0
+        self.bytes = 0
+        self.errors = Counter()
+        self.latencies = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, other):
+        self.calls += other.calls
+        self.bytes += other.bytes
+        self.errors.update(other.errors)
+        self.latencies = [a + b for a, b in zip(self.latencies, other.latencies)]
+
+    def latency(self, p):
+        """Returns the upper bound of the histogram bucket holding the ``p``th percentile."""
+        if not self.calls:
+            return 0.0
+        wanted = self.calls * p / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latencies):
+            seen += count
+            if seen >= wanted:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class UsageTracker:
+    """Counts requests against a daily call budget.
+
+    Every request is recorded under a key, like an endpoint and priority
+    lane, in buckets of ``resolution`` seconds that are kept for a day so
+    usage can be summed over any window up to that. Calls are also counted
+    per UTC day to project where the day will end up.
+    """
+
+    def __init__(self, daily_limit=100000, resolution=60, *, timer=time.time):
+        self.daily_limit = daily_limit
+        self.resolution = resolution
+        self.timer = timer
+        self.buckets = {}
+
+        self.day = None
+        self.calls_today = 0
+
+    def record(self, key, status, latency, size=0):
+        """Records a request. ``status`` is the HTTP status, the name of the error
+        or None for a request that was given up on before it was answered."""
+        now = self.timer()
+        start = now - now % self.resolution
+
+        buckets = self.buckets.setdefault(key, deque())
+        if not buckets or buckets[-1].start != start:
+            buckets.append(Bucket(start))
+            while buckets[0].start <= now - 24 * 60 * 60:
+                buckets.popleft()
+
+        bucket = buckets[-1]
+        bucket.calls += 1
+        bucket.bytes += size
+        if status is not None and not (isinstance(status, int) and status < 400):
+            bucket.errors[status] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                bucket.latencies[i] += 1
+                break
+
+        day = datetime.datetime.utcfromtimestamp(now).date()
+        if day != self.day:
+            self.day = day
+            self.calls_today = 0
+        self.calls_today += 1
+
+    def window(self, seconds):
+        """Returns ``{key: Bucket}`` summing up the requests of the last ``seconds``."""
+        since = self.timer() - seconds
+        totals = {}
+        for key, buckets in self.buckets.items():
+            total = Bucket(since)
+            for bucket in reversed(buckets):
+                if bucket.start + self.resolution <= since:
+                    break
+                total.add(bucket)
+            if total.calls:
+                totals[key] = total
+        return totals
+
+    def projected_today(self, rate_window=60 * 60):
+        """Returns the calls made today and how many there will be by the end of
+        the UTC day at the rate of the last ``rate_window`` seconds."""
+        now = self.timer()
+        if datetime.datetime.utcfromtimestamp(now).date() != self.day:
+            return 0, 0
+
+        recent = sum(bucket.calls for bucket in self.window(rate_window).values())
+        remaining = 24 * 60 * 60 - now % (24 * 60 * 60)
+        return self.calls_today, int(self.calls_today + recent / rate_window * remaining)
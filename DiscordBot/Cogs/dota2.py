@@ -2,13 +2,14 @@ import asyncio
 import datetime
 import json
 import time
+import traceback
 
 import discord.utils
 import requests
 from discord.ext import commands
 from lxml import html
 
-from .Utils import checks, db, steamapi, zrpc
+from .Utils import checks, database, hedge, ingester, nodebridge, ratelimit, steamapi, urls
 
 
 class Dota2:
@@ -17,7 +18,7 @@ class Dota2:
     def __init__(self, bot):
 
         self.bot = bot
-        self.steam_api = steamapi.SteamAPI(bot.steam_api_key)
+        self.steam_api = bot.steam_api
         with open("Dota/heroes.json", 'r') as f:
             self.heroes = json.load(f)['result']['heroes']
         with open("Dota/items.json", 'r') as f:
@@ -29,19 +30,39 @@ class Dota2:
         with open("Dota/regions.json", 'r') as f:
             self.regions = json.load(f)['regions']
 
-        self.notable_players = db.Database("Dota/notable_players.json")
-
-        self.match_strings = []
-        #self.loop = asyncio.get_event_loop()
-        #self.loop.create_task(self.run_match_ticker())
-
-        self.last_match_seq = {}
+        self.notable_players = database.Database("Dota/notable_players.db", backend=database.SQLiteBackend,
+                                                 flush_interval=5.0, migrate_from="Dota/notable_players.json")
+
+        # The ticker is fed by one ingester following every match Steam
+        # finishes, instead of polling the match history of every member.
+        self.ingester_state = database.Database("Dota/ingester.db", backend=database.SQLiteBackend,
+                                                flush_interval=5.0)
+        self.ingester = ingester.MatchIngester(self.steam_api, self.ingester_state,
+                                               match_store=bot.match_store)
+        self.ingester.on('match', self.report_match)
+        # Off unless the config turns it on, like it was before the ingester.
+        self.ticker = None
+        if getattr(bot, 'match_ticker', False):
+            self.ticker = self.bot.loop.create_task(self.run_match_ticker())
+
+        # Match details come from the Web API or the Dota GC, whichever is quicker lately.
+        self.match_details = hedge.HedgedFetcher({
+            'webapi': self.webapi_match_details,
+            'gc': self.gc_match_details,
+        }, hedge_after=0.75, loop=self.bot.loop)
+
+    def __unload(self):
+        if self.ticker is not None:
+            self.ticker.cancel()
+        self.bot.loop.create_task(self.notable_players.close())
+        self.bot.loop.create_task(self.ingester_state.close())
 
     @commands.command(hidden=True)
     @checks.is_owner()
     async def update_heroes(self):
         """Updates the internal hero database"""
-        heroes = self.steam_api.get_heroes()
+        self.steam_api.clear_cache(urls.GET_HEROES)
+        heroes = await self.steam_api.get_heroes(priority=ratelimit.LOW)
 
         with open("Dota/heroes.json", 'w') as f:
             json.dump(heroes, f, ensure_ascii=True, indent=4)
@@ -52,7 +73,8 @@ class Dota2:
     @checks.is_owner()
     async def update_items(self):
         """Updates the internal item database"""
-        items = self.steam_api.get_game_items()
+        self.steam_api.clear_cache(urls.GET_GAME_ITEMS)
+        items = await self.steam_api.get_game_items(priority=ratelimit.LOW)
 
         with open("Dota/items.json", 'w') as f:
             json.dump(items, f, ensure_ascii=True, indent=4)
@@ -101,9 +123,10 @@ class Dota2:
 
         msg = "__Dotabuff page(s) for {0.name}:__\n\n".format(member)
         try:
-            response = self.steam_api.get_player_summaries(steam_ids)['response']
+            response = (await self.steam_api.get_player_summaries(steam_ids))['response']
         except:
             await self.bot.say("The Steam Web API is down. Please try again later.")
+            return
         # Response isn't in a guaranteed order.
         for steam_id in steam_ids:
             for player in response['players']:
@@ -112,10 +135,20 @@ class Dota2:
                     msg += "{0} - <https://dotabuff.com/players/{1}>\n".format(player['personaname'], dota_id)
         await self.bot.say(msg)
 
-    def get_latest_match(self, steam_id):
+    async def webapi_match_details(self, match_id):
+        result = (await self.steam_api.get_match_details(match_id)).get('result')
+        return result if result is not None and 'error' not in result else None
+
+    async def gc_match_details(self, match_id):
+        # Not saved to the match store, the GC's matches only have part of what
+        # GetMatchDetails returns and would be served as full ones afterwards.
+        return await self.bot.node.get_match_details(match_id)
+
+    async def get_latest_match(self, steam_id, priority=ratelimit.HIGH):
         """Gets the latest match for a given Steam ID"""
         try:
-            req = self.steam_api.get_match_history(account_id=steam_id, matches_requested=1)
+            req = await self.steam_api.get_match_history(account_id=steam_id, matches_requested=1,
+                                                         priority=priority)
             result = req['result']
         except:
             return None
@@ -128,12 +161,12 @@ class Dota2:
 
         return result['matches'][0]
 
-    def get_latest_match_from_list(self, steam_ids):
+    async def get_latest_match_from_list(self, steam_ids, priority=ratelimit.HIGH):
         """Gets simple match data for the latest game played from a list of IDs"""
         latest_match = {}
 
         for steam_id in steam_ids:
-            match = self.get_latest_match(steam_id)
+            match = await self.get_latest_match(steam_id, priority)
             if match is None:
                 return None
             if not match == {} and (latest_match == {} or latest_match['match_seq_num'] < match['match_seq_num']):
@@ -260,7 +293,7 @@ class Dota2:
             return
 
         tmp = await self.bot.say("Getting latest match for linked Steam accounts.")
-        match = self.get_latest_match_from_list(steam_ids)
+        match = await self.get_latest_match_from_list(steam_ids)
 
         if match is None:
             await self.bot.delete_message(tmp)
@@ -269,9 +302,8 @@ class Dota2:
         else:
             await self.bot.edit_message(tmp, "Latest match ID found. Getting match data...")
 
-            try:
-                match_info = self.steam_api.get_match_details(match['match_id'])['result']
-            except:
+            match_info = await self.match_details.fetch(match['match_id'])
+            if match_info is None:
                 await self.bot.delete_message(tmp)
                 await self.bot.say("The Steam Web API is down. Please try again later.")
                 return
@@ -368,70 +400,72 @@ class Dota2:
 
     async def run_match_ticker(self):
         print('[Dota]: Match ticker initialized')
-        while not self.loop.is_closed():
-            # Print the last time the match ticker ran for debugging
-            ts = time.time()
-            st = datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
-            print("[Dota]: Match ticker ran at {0}".format(st))
-
-            # Make a copy of the server data
-            servers = self.bot.servers
-            # Check if any new servers got added
-            if not len(servers) == len(self.last_match_seq):
-                for server in servers:
-                    if server.id not in self.last_match_seq:
-                        self.last_match_seq[server.id] = 0
-
-            # Start a task for each server with the ticker enabled
-            num_futures = 0
-            futures = []
-            channels = []
-            for server in servers:
-                settings = self.bot.dota_ticker_settings.get(server.id)
-                if settings is not None and settings['enabled']:
-                    # Start a task for the server
-                    num_futures += 1
-                    futures.append(self.loop.run_in_executor(None, self.check_server_for_new_matches, server))
-                    channels.append(server.get_channel(settings['channel_id']))
-
-            # Report the match data
-            for x in range(num_futures):
-                match_strings = await futures[x]
-                for match_string in match_strings:
-                    await self.bot.send_message(channels[x], match_string)
-
-            await asyncio.sleep(60)
-
-    def check_server_for_new_matches(self, server):
-        new_matches = {}
-        latest_match = 0
-        match_strings = []
-
-        # Get a list of unreported matches since last check
-        for member in server.members:
-            steam_ids = self.bot.steam_info.get(member.id)
-            if steam_ids is not None:
-                # Only one latest match per player
-                match = self.get_latest_match_from_list(steam_ids)
-                if match is not None and self.last_match_seq[server.id] < match['match_seq_num']:
-                    new_matches[match['match_id']] = match
-                    latest_match = max(latest_match, match['match_seq_num'])
-
-        if self.last_match_seq[server.id] > 0:
-            for x, match in new_matches.items():
-                r = self.steam_api.get_match_details(match['match_id'])
-                if 'result' in r:
-                    match_string = "A game of Dota just ended. Match info: \n\n"
-                    match_info = r['result']
-                    match_string += self.parse_match(match_info)
-
-                    # Put the string in the parsed list
-                    match_strings.append(match_string)
-
-        # Update the latest reported match for the server.
-        self.last_match_seq[server.id] = max(self.last_match_seq[server.id], latest_match)
-
-        return match_strings
+        ingesting = None
+        try:
+            while not self.bot.is_closed:
+                # Print the last time the match ticker ran for debugging
+                ts = time.time()
+                st = datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+                print("[Dota]: Match ticker ran at {0}".format(st))
+
+                try:
+                    # Members join, leave and link accounts, so refresh who to look out for.
+                    self.ingester.watched = self.ticker_players()
+
+                    # Reading every match Steam finishes costs API calls, so
+                    # only do it while there is someone to report.
+                    if self.ingester.watched and ingesting is None:
+                        ingesting = self.bot.loop.create_task(self.ingester.run())
+                    elif not self.ingester.watched and ingesting is not None:
+                        ingesting.cancel()
+                        ingesting = None
+                        # Nothing that ends meanwhile needs reporting, so
+                        # start again at the newest match instead of catching up.
+                        if self.ingester.next_seq_num is not None:
+                            await self.ingester_state.remove('next_seq_num')
+                except asyncio.CancelledError:
+                    raise
+                except:
+                    traceback.print_exc()
+
+                await asyncio.sleep(60)
+        finally:
+            if ingesting is not None:
+                ingesting.cancel()
+
+    def ticker_players(self):
+        """Maps the Dota IDs of members of servers with the ticker enabled to those servers' IDs"""
+        players = {}
+        for server in self.bot.servers:
+            settings = self.bot.dota_ticker_settings.get(server.id)
+            if settings is None or not settings.get('enabled'):
+                continue
+
+            for member in server.members:
+                steam_ids = self.bot.steam_info.get(member.id)
+                if steam_ids is not None:
+                    for steam_id in steam_ids:
+                        players.setdefault(steamapi.ID.steam_to_dota(steam_id), set()).add(server.id)
+
+        return players
+
+    async def report_match(self, match_info, dota_ids):
+        """Posts a match from the ingester in the ticker channel of every server a player is in"""
+        server_ids = set()
+        for dota_id in dota_ids:
+            server_ids.update(self.ingester.watched.get(dota_id, ()))
+
+        match_string = "A game of Dota just ended. Match info: \n\n"
+        match_string += self.parse_match(match_info)
+
+        for server_id in server_ids:
+            settings = self.bot.dota_ticker_settings.get(server_id)
+            if settings is None or not settings['enabled']:
+                continue
+
+            channel = self.bot.get_channel(settings['channel_id'])
+            if channel is not None:
+                await self.bot.send_message(channel, match_string)
 
     @commands.command(pass_context=True)
     async def mmr(self, ctx, *, member: discord.Member=None):
@@ -441,10 +475,10 @@ class Dota2:
         If no member is specified then the info returned is for the user
         that invoked the command."""
 
-        # Check that the ZRPC server is up
+        # Check that the Node bridge is up
         try:
-            zrpc.hello()
-        except:
+            await self.bot.node.hello(timeout=2.0)
+        except (nodebridge.NodeUnavailable, nodebridge.NodeError, asyncio.TimeoutError):
             await self.bot.say("The ZRPC server is currently down.")
             return
 
@@ -460,26 +494,30 @@ class Dota2:
         msg = "__MMR Information for {0.name}:__\n\n".format(member)
         tmp = await self.bot.say("Getting account info for linked Steam accounts.")
         try:
-            response = self.steam_api.get_player_summaries(steam_ids)['response']
+            response = (await self.steam_api.get_player_summaries(steam_ids))['response']
         except:
             await self.bot.delete_message(tmp)
             await self.bot.say("The Steam Web API is down. Please try again later.")
             return
         # Response isn't in a guaranteed order.
+        players = {player['steamid']: player for player in response['players']}
+        steam_ids = [steam_id for steam_id in steam_ids if steam_id in players]
+
         await self.bot.edit_message(tmp, 'Account data received. Fetching Dota 2 profile cards...')
+        try:
+            mmrs = await self.bot.node.get_mmr_for_dotaids([steamapi.ID.steam_to_dota(s) for s in steam_ids])
+        except:
+            mmrs = None
+        if mmrs is None or None in mmrs.values():
+            await self.bot.delete_message(tmp)
+            await self.bot.say("Profile cards are down. Please try again later.")
+            return
+
         for steam_id in steam_ids:
-            for player in response['players']:
-                if player['steamid'] == steam_id:
-                    dota_id = steamapi.ID.steam_to_dota(steam_id)
-                    try:
-                        smmr, pmmr = zrpc.get_mmr_for_dotaid(str(dota_id))
-                    except:
-                        await self.bot.delete_message(tmp)
-                        await self.bot.say("Profile cards are down. Please try again later.")
-                        return
-                    msg += "{0} - Solo MMR: {1} | Party MMR: {2}\n"\
-                        .format(player['personaname'], smmr if smmr is not None else 'Hidden',
-                                pmmr if pmmr is not None else 'Hidden')
+            smmr, pmmr = mmrs[steamapi.ID.steam_to_dota(steam_id)]
+            msg += "{0} - Solo MMR: {1} | Party MMR: {2}\n"\
+                .format(players[steam_id]['personaname'], smmr if smmr is not None else 'Hidden',
+                        pmmr if pmmr is not None else 'Hidden')
         await self.bot.delete_message(tmp)
         await self.bot.say(msg)
 
@@ -57,7 +57,7 @@ class EGL:
 
     def __init__(self, bot):
         self.bot = bot
-        self.egl_db = database.Database('egl.json')
+        self.egl_db = database.Database('egl.db', backend=database.SQLiteBackend, migrate_from='egl.json')
 
     async def on_member_join(self, member):
         if self.bot.debug_mode:
@@ -172,8 +172,7 @@ class EGL:
 
         This command can only be used by server admins.
         """
-        survey = self.egl_db.get('survey', {})
-        survey['intro'] = text
+        await self.egl_db.put_path(('survey', 'intro'), text)
         await self.bot.say("New intro set.")
 
     @survey.group( pass_context=True)
@@ -196,8 +195,7 @@ class EGL:
             position = sys.maxsize
 
         questions.insert(position - 1, question)
-        survey['questions'] = questions
-        await self.egl_db.put('survey', survey)
+        await self.egl_db.put_path(('survey', 'questions'), questions)
 
     @add_question.command(pass_context=True)
     @is_egl_server()
@@ -9,7 +9,8 @@ class Logging:
 
 	def __init__(self, bot):
 		self.bot = bot
-		self.logging_db = database.Database('Config/logging.json')
+		self.logging_db = database.Database('Config/logging.db', backend=database.SQLiteBackend,
+		                                    migrate_from='Config/logging.json')
 
 		folders = os.listdir('logs')
 		for server in bot.servers:
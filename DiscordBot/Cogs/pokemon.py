@@ -1,14 +1,15 @@
 import discord
 import re
 from discord.ext import commands
-from .utils import checks, db
+from .Utils import checks, database
 
 class Pokemon:
     """Pokemon related commands"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.pokemon_db = db.Databade('pokemon.json')
+        self.pokemon_db = database.Database('pokemon.db', backend=database.SQLiteBackend,
+                                             migrate_from='pokemon.json')
         self.friend_code_regex = re.compile(r'^(?P<one>[0-9]{4})[- _]?(?P<two>[0-9]{4})[- _]?(?P<three>[0-9]{4})$')
 
     async def create_or_get_friend_code(self, message):
@@ -41,8 +42,7 @@ class Pokemon:
                     continue
 
                 code = '{one}-{two}-{three}'.format(**match.groupdict())
-                fcs[author.id] = code
-                await self.pokemon_db.put('friend_codes', fcs)
+                await self.pokemon_db.put_path(('friend_codes', author.id), code)
                 return await self.bot.send_message(channel, 'Successfully set friend code to ' + code)
         else:
             await self.bot.send_message(channel, '3DS Friend Code for %s: %s' % (author.display_name, code))
@@ -64,9 +64,7 @@ class Pokemon:
     @commands.command(pass_context=True)
     async def remove_fc(self, ctx):
         """Removes your stored friend code"""
-        fcs = self.pokemon_db.get('friend_codes', {})
-        del fcs[ctx.author.id]
-        await self.pokemon_db.put('friend_codes', fcs)
+        await self.pokemon_db.remove_path(('friend_codes', ctx.message.author.id))
         await self.bot.say("Your now have no friend code in the database.")
 
 
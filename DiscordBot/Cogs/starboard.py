@@ -22,15 +22,23 @@ def requires_starboard():
     return commands.check(predicate)
 
 
+def starboard_entry(guild_id, message_id, data):
+    """Maps a message posted in a starboard back to the message it stars."""
+    if isinstance(data, list) and data[0] is not None:
+        yield (guild_id, data[0]), message_id
+
+
 class Starboard:
     def __init__(self, bot):
         self.bot = bot
 
-        self.stars_db = database.Database('stars.json')
+        self.stars_db = database.Database('stars.db', backend=database.SQLiteBackend, flush_interval=1.0,
+                                          lazy=True, evict_after=3600.0, migrate_from='stars.json')
+        self.stars_db.create_index('starboard', starboard_entry, nested=True)
         self._message_cache = {}
 
     def __unload(self):
-        pass
+        self.bot.loop.create_task(self.stars_db.close())
 
     async def clean_starboard(self, ctx, min_stars):
         dead_messages = {
@@ -113,11 +121,11 @@ class Starboard:
             except:
                 pass
 
-            tup = discord.utils.find(lambda t: isinstance(t[1], list) and t[1][0] == message_id, db.items())
-            if tup is None:
+            original_id = self.stars_db.lookup('starboard', (guild_id, message_id))
+            if original_id is None:
                 raise StarboardError('\N{NO ENTRY SIGN} Could not find this message ID in the starboard.')
 
-            star_message = await self.get_message(star_message.channel_mentions[0], tup[0])
+            star_message = await self.get_message(star_message.channel_mentions[0], original_id)
             if star_message is None:
                 raise StarboardError('\N{BLACK QUESTION MARK ORNAMENT} This message could not be found.')
 
@@ -145,17 +153,16 @@ class Starboard:
         if stars[0] is None:
             sent = await self.bot.send_message(starboard_channel, content, embed=embed)
             stars[0] = sent.id
-            await self.stars_db.put(guild_id, db)
+            await self.stars_db.put_path((guild_id, message_id), stars)
             return
 
         bot_msg = await self.get_message(starboard_channel, stars[0])
         if bot_msg is None:
             await self.bot.say('\N{BLACK QUESTION MARK ORNAMENT} Expected to be in {0.mention} but is not.'.format(starboard_channel))
-            db.pop(message_id, None)
-            await self.stars_db.put(guild_id, db)
+            await self.stars_db.remove_path((guild_id, message_id))
             return
 
-        await self.stars_db.put(guild_id, db)
+        await self.stars_db.put_path((guild_id, message_id), stars)
         await self.bot.edit_message(bot_msg, content, embed=embed)
 
     async def unstar_message(self, message, starrer_id, message_id):
@@ -179,8 +186,7 @@ class Starboard:
         bot_msg = await self.get_message(starboard_channel, stars[0])
         if bot_msg is not None:
             if len(starrers) == 0:
-                db.pop(message_id, None)
-                await self.stars_db.put(guild_id, db)
+                await self.stars_db.remove_path((guild_id, message_id))
                 await self.bot.delete_message(bot_msg)
             else:
                 if message.id != message_id:
@@ -191,7 +197,7 @@ class Starboard:
                     star_message = message
 
                 content, embed = self.emoji_message(star_message, len(starrers))
-                await self.stars_db.put(guild_id, db)
+                await self.stars_db.put_path((guild_id, message_id), stars)
                 await self.bot.edit_message(bot_msg, content, embed=embed)
 
     @commands.command(pass_context=True, no_pm=True)
@@ -300,10 +306,9 @@ class Starboard:
 
         # see if the message being deleted is in the starboard
         msg_id = payload['id']
-        exists = discord.utils.find(lambda k: isinstance(db[k], list) and db[k][0] == msg_id, db)
+        exists = self.stars_db.lookup('starboard', (server.id, msg_id))
         if exists:
-            db.pop(exists)
-            await self.stars_db.put(server.id, db)
+            await self.stars_db.remove_path((server.id, exists))
 
     @commands.group(pass_context=True, no_pm=True, invoke_without_command=True)
     async def star(self, ctx, message: int):
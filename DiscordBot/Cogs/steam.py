@@ -1,6 +1,8 @@
+import asyncio
+
 from discord.ext import commands
 
-from .Utils import steamapi, zrpc
+from .Utils import checks, nodebridge
 
 
 class Steam:
@@ -31,10 +33,10 @@ class Steam:
                                    .format(ctx))
             return
 
-        # Check that the ZRPC server is up
+        # Check that the Node bridge is up
         try:
-            zrpc.hello()
-        except:
+            await self.bot.node.hello(timeout=2.0)
+        except (nodebridge.NodeUnavailable, nodebridge.NodeError, asyncio.TimeoutError):
             await self.bot.say("The ZRPC server is currently down. Tell MashThat5A.")
             return
 
@@ -59,7 +61,7 @@ class Steam:
             return
 
         steamthing = msg.content
-        steamid = steamapi.SteamAPI(self.bot.steam_api_key).determine_steam_id(steamthing)
+        steamid = await self.bot.steam_api.determine_steam_id(steamthing)
 
         if steamid == 76561198296540546:
             await self.bot.whisper('You have linked something to MT5ABot. Goodbye.')
@@ -70,7 +72,7 @@ class Steam:
                                    .format(steamthing))
             return
 
-        if zrpc.add_pending_discord_link(str(steamid), str(author.id)):
+        if await self.bot.node.add_pending_discord_link(str(steamid), str(author.id)):
             await self.bot.whisper(
                 "Your Steam account was determined to be http://steamcommunity.com/profiles/{0}".format(steamid))
             await self.bot.whisper(
@@ -89,10 +91,10 @@ class Steam:
 
     @link_steam.command(name='verify', pass_context=True, hidden=True)
     async def verify(self, ctx):
-        # Check that the ZRPC server is up
+        # Check that the Node bridge is up
         try:
-            zrpc.hello()
-        except:
+            await self.bot.node.hello(timeout=2.0)
+        except (nodebridge.NodeUnavailable, nodebridge.NodeError, asyncio.TimeoutError):
             await self.bot.say("The ZRPC server is currently down. Tell @MashThat5A#6431")
             return
 
@@ -107,7 +109,11 @@ class Steam:
             await self.bot.say("Please only input the code given through Steam.")
             return
 
-        reply = zrpc.verify_code(str(author.id), split_msg[2])
+        try:
+            reply = await self.bot.node.verify_code(str(author.id), split_msg[2])
+        except nodebridge.NodeError:
+            # No code was generated for this member.
+            reply = False
         if reply:
             steam_info = self.bot.steam_info.get(author.id)
             if steam_info is None:
@@ -130,6 +136,72 @@ class Steam:
                 "please send 'link discord {0.id}' to MT5ABot "
                 "over Steam chat.".format(author))
 
+    @commands.command(hidden=True)
+    @checks.is_owner()
+    async def resolve_steam_ids(self, *identifiers: str):
+        """Works out the Steam IDs of many identifiers at once."""
+        steam_ids = await self.bot.steam_api.resolve_steam_ids(identifiers)
+
+        msg = ''
+        for identifier in identifiers:
+            msg += "{0} - {1}\n".format(identifier, steam_ids[identifier] or 'Unknown')
+        await self.bot.say(msg or "No identifiers given.")
+
+    @commands.command(hidden=True)
+    @checks.is_owner()
+    async def steam_usage(self):
+        """Shows what is using up the daily Steam Web API budget."""
+        steam_api = self.bot.steam_api
+        usage = steam_api.usage
+        minute, hour, day = usage.window(60), usage.window(60 * 60), usage.window(24 * 60 * 60)
+
+        msg = "```\n{0:<36}{1:>5}{2:>6}{3:>7}{4:>8}{5:>8}{6:>8}  {7}\n".format(
+            'Endpoint (lane)', '1m', '1h', '24h', 'p50 ms', 'p90 ms', 'KB 1h', 'Errors 24h')
+        for key in sorted(day, key=lambda k: day[k].calls, reverse=True):
+            recent = hour.get(key, day[key])
+            errors = ', '.join('{0}x{1}'.format(code, count) for code, count in day[key].errors.most_common(3))
+            msg += "{0:<36}{1:>5}{2:>6}{3:>7}{4:>8.0f}{5:>8.0f}{6:>8.0f}  {7}\n".format(
+                '{0} ({1})'.format(*key), minute[key].calls if key in minute else 0,
+                hour[key].calls if key in hour else 0, day[key].calls, recent.latency(50) * 1000,
+                recent.latency(90) * 1000, (hour[key].bytes if key in hour else 0) / 1024, errors or '-')
+
+        today, projected = usage.projected_today()
+        msg += "\nToday (UTC): {0} calls, projected {1} of {2} ({3:.0%})\n".format(
+            today, projected, usage.daily_limit, projected / usage.daily_limit)
+
+        lanes = steam_api.limiter.stats()
+        msg += "Queued: {0} high, {1} low. Coalesced calls: {2}\n".format(
+            lanes['high']['queued'], lanes['low']['queued'], steam_api.coalesced)
+        msg += "```"
+        await self.bot.say(msg)
+
+    @commands.command(hidden=True)
+    @checks.is_owner()
+    async def node_queues(self):
+        """Shows how long requests wait in the Node bridge's queues and how its caches do."""
+        try:
+            queues = await self.bot.node.queue_stats()
+            caches = await self.bot.node.cache_stats()
+        except (nodebridge.NodeUnavailable, nodebridge.NodeError, asyncio.TimeoutError):
+            await self.bot.say("The ZRPC server is currently down.")
+            return
+
+        msg = "```\n{0:<16}{1:>8}{2:>8}{3:>8}{4:>9}{5:>8}{6:>12}{7:>12}\n".format(
+            'Queue', 'Waiting', 'Running', 'Served', 'Rejected', 'Expired', 'Wait avg ms', 'Wait max ms')
+        for name in sorted(queues):
+            queue = queues[name]
+            msg += "{0:<16}{1:>8}{2:>8}{3:>8}{4:>9}{5:>8}{6:>12.0f}{7:>12.0f}\n".format(
+                name, queue['waiting'], queue['running'], queue['served'], queue['rejected'], queue['expired'],
+                queue['wait_avg'], queue['wait_max'])
+
+        msg += "\n"
+        for name in sorted(caches):
+            cache = caches[name]
+            msg += "{0}: {1} cached, {2} hits, {3} misses ({4:.0%} hit rate)\n".format(
+                name, cache['size'], cache['hits'], cache['misses'], cache['hit_rate'])
+        msg += "```"
+        await self.bot.say(msg)
+
 
 def setup(bot):
     bot.add_cog(Steam(bot))
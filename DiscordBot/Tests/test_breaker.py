@@ -0,0 +1,76 @@
+"""Tests for Cogs/Utils/breaker.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import unittest
+
+from Cogs.Utils.breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(failures=3, reset_after=30.0, timer=self.clock)
+
+    def test_opens_after_failures_in_a_row(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        self.breaker.success()
+        self.breaker.failure()
+        self.breaker.failure()
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.open)
+
+        self.breaker.failure()
+        self.assertTrue(self.breaker.open)
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.rejected, 2)
+
+    def test_probes_after_reset(self):
+        for _ in range(3):
+            self.breaker.failure()
+
+        self.clock.now = 29
+        self.assertEqual(self.breaker.retry_in(), 1)
+        self.assertFalse(self.breaker.allow())
+
+        # One call probes, the rest wait for another period.
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+    def test_failed_probe_opens_again(self):
+        for _ in range(3):
+            self.breaker.failure()
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.clock.now = 35
+        self.breaker.failure()
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+    def test_successful_probe_closes(self):
+        for _ in range(3):
+            self.breaker.failure()
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.success()
+        self.assertFalse(self.breaker.open)
+        self.assertEqual(self.breaker.retry_in(), 0)
+
+        # It takes a full run of failures to open it again.
+        self.breaker.failure()
+        self.assertTrue(self.breaker.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Tests for Cogs/Utils/cache.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import unittest
+
+from Cogs.Utils.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=10, timer=self.clock)
+        cache.put('a', 1)
+        cache.put('b', 2, ttl=30)
+
+        self.clock.now = 9
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIn('a', cache)
+
+        self.clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.get('b'), 2)
+
+        self.clock.now = 30
+        self.assertEqual(cache.get('b', 'gone'), 'gone')
+
+    def test_without_ttl(self):
+        cache = TTLCache(ttl=None, timer=self.clock)
+        cache.put('a', 1)
+        self.clock.now = 10 ** 6
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_least_recently_used_are_dropped(self):
+        cache = TTLCache(maxsize=2, timer=self.clock)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_hits_and_misses(self):
+        cache = TTLCache(timer=self.clock)
+        self.assertEqual(cache.hit_rate, 0.0)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertAlmostEqual(cache.hit_rate, 2 / 3)
+
+    def test_pop_and_clear(self):
+        cache = TTLCache(timer=self.clock)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.pop('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
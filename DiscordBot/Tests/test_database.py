@@ -0,0 +1,493 @@
+"""Tests for Cogs/Utils/database.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from Cogs.Utils import database
+
+
+class FlakyLogBackend(database.LogBackend):
+    """Fails the writes it is told to fail and counts the ones that went through."""
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.failures = 0
+        self.writes = []
+
+    def write(self, lines):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('disk full')
+        super().write(lines)
+        self.writes.append(lines)
+
+
+class SlowLogBackend(database.LogBackend):
+    """Takes a while to write and notes whether it was closed meanwhile."""
+
+    delay = 0.1
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.writing = threading.Event()
+        self.busy = False
+        self.closed_while_writing = False
+
+    def write(self, lines):
+        self.busy = True
+        self.writing.set()
+        time.sleep(self.delay)
+        super().write(lines)
+        self.busy = False
+
+    def close(self):
+        self.closed_while_writing |= self.busy
+        super().close()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='dbtest')
+        # Database creates its lock on the current event loop.
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self, name, **options):
+        return database.Database(self.path(name), loop=self.loop, **options)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def contents(self, name, **options):
+        """Returns everything that is on disk for a database."""
+        db = self.open(name, **options)
+        try:
+            return dict(db.all())
+        finally:
+            self.run_async(db.close())
+
+    def reopen(self, db, name, **options):
+        """Closes ``db`` and returns everything that is on disk for it."""
+        self.run_async(db.close())
+        return self.contents(name, **options)
+
+
+class LogBackendTest(DatabaseTestCase):
+    def test_replay(self):
+        db = self.open('log.json', log=True)
+        self.run_async(db.put('a', 1))
+        self.run_async(db.put('b', {'x': 2}))
+        self.run_async(db.put_path(('b', 'y'), 3))
+        self.run_async(db.remove_path(('b', 'x')))
+        self.run_async(db.put('c', 4))
+        self.run_async(db.remove('c'))
+
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': 1, 'b': {'y': 3}})
+        self.assertFalse(os.path.exists(self.path('log.json')))
+
+    def test_torn_last_line(self):
+        db = self.open('log.json', log=True)
+        self.run_async(db.put('a', 1))
+        self.run_async(db.put('b', 2))
+        self.run_async(db.close())
+
+        # The process died halfway through writing an entry.
+        with open(self.path('log.json.log'), 'a') as f:
+            f.write('["put", {"c": ')
+
+        db = self.open('log.json', log=True)
+        self.assertEqual(dict(db.all()), {'a': 1, 'b': 2})
+
+        # Entries written after recovering aren't lost with the torn one.
+        self.run_async(db.put('d', 4))
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': 1, 'b': 2, 'd': 4})
+
+    def test_entry_without_newline_is_torn(self):
+        with open(self.path('log.json.log'), 'w') as f:
+            f.write('["put", {"a": 1}]\n["put", {"b": 2}]')
+
+        db = self.open('log.json', log=True)
+        self.assertEqual(dict(db.all()), {'a': 1})
+        self.run_async(db.close())
+
+    def test_compaction_then_reload(self):
+        db = self.open('log.json', log=True, compact_after=5)
+        for i in range(12):
+            self.run_async(db.put('key{0}'.format(i), i))
+        self.run_async(db.put_path(('nested', 'a'), 1))
+        self.run_async(db.remove('key0'))
+        expected = dict(db.all())
+        self.run_async(db.close())
+
+        # Compacted entries moved into the snapshot, only the rest is still logged.
+        with open(self.path('log.json')) as f:
+            snapshot = json.load(f)
+        with open(self.path('log.json.log')) as f:
+            logged = f.readlines()
+        self.assertLessEqual({'key1', 'key2', 'key3', 'key4'}, set(snapshot))
+        self.assertLess(len(logged), 5)
+        self.assertFalse(os.path.exists(self.path('log.json.log.old')))
+
+        db = self.open('log.json', log=True, compact_after=5)
+        self.assertEqual(dict(db.all()), expected)
+
+        # The compacted database keeps working like before.
+        self.run_async(db.put('key0', 'back'))
+        expected['key0'] = 'back'
+        self.assertEqual(self.reopen(db, 'log.json', log=True), expected)
+
+    def test_interrupted_compaction(self):
+        # The rotated log is older than the active one and has to be replayed first.
+        with open(self.path('log.json'), 'w') as f:
+            json.dump({'a': 0, 'b': 0}, f)
+        with open(self.path('log.json.log.old'), 'w') as f:
+            f.write('["put", {"a": 1}]\n["put", {"b": 1}]\n')
+        with open(self.path('log.json.log'), 'w') as f:
+            f.write('["put", {"a": 2}]\n')
+
+        db = self.open('log.json', log=True)
+        self.assertEqual(dict(db.all()), {'a': 2, 'b': 1})
+        self.run_async(db.close())
+
+
+class MigrationTest(DatabaseTestCase):
+    def test_migrate_from(self):
+        with open(self.path('old.json'), 'w') as f:
+            json.dump({'a': 1, 'b': {'x': 2}}, f)
+        with open(self.path('old.json.log'), 'w') as f:
+            f.write('["put", {"c": 3}]\n["put_path", [["b", "y"], 4]]\n')
+
+        db = self.open('new.db', backend=database.SQLiteBackend, migrate_from=self.path('old.json'))
+        expected = {'a': 1, 'b': {'x': 2, 'y': 4}, 'c': 3}
+        self.assertEqual(dict(db.all()), expected)
+        self.run_async(db.close())
+        self.assertFalse(os.path.exists(self.path('new.db.migrating')))
+
+        # Only done while the new database doesn't exist.
+        with open(self.path('old.json'), 'w') as f:
+            json.dump({'stale': True}, f)
+        self.assertEqual(self.contents('new.db', backend=database.SQLiteBackend,
+                                       migrate_from=self.path('old.json')), expected)
+
+    def test_nothing_to_migrate(self):
+        db = self.open('new.db', backend=database.SQLiteBackend, migrate_from=self.path('missing.json'))
+        self.assertEqual(dict(db.all()), {})
+        self.run_async(db.close())
+
+
+class SQLiteBackendTest(DatabaseTestCase):
+    def open_sqlite(self, **options):
+        return self.open('sqlite.db', backend=database.SQLiteBackend, **options)
+
+    def reopen_sqlite(self, db, **options):
+        return self.reopen(db, 'sqlite.db', backend=database.SQLiteBackend, **options)
+
+    def member_rows(self, key):
+        connection = sqlite3.connect(self.path('sqlite.db'))
+        try:
+            return dict(connection.execute('SELECT member, value FROM members WHERE key = ?', (key,)))
+        finally:
+            connection.close()
+
+    def test_put_path_round_trip(self):
+        db = self.open_sqlite()
+        self.run_async(db.put('guild', {'channel': 'c', 'm1': ['a', ['b']]}))
+        self.run_async(db.put_path(('guild', 'm2'), ['c', []]))
+        self.run_async(db.put_path(('guild', 'm1'), ['a', ['b', 'd']]))
+        self.run_async(db.put_path(('guild', 'settings', 'deep'), {'on': True}))
+        self.run_async(db.put_path(('new', 'member'), 1))
+        self.run_async(db.put('plain', [1, 2]))
+        expected = {
+            'guild': {'channel': 'c', 'm1': ['a', ['b', 'd']], 'm2': ['c', []], 'settings': {'deep': {'on': True}}},
+            'new': {'member': 1},
+            'plain': [1, 2],
+        }
+        self.assertEqual(dict(db.all()), expected)
+        self.assertEqual(self.reopen_sqlite(db), expected)
+
+        # Every member of a top-level dict is a row of its own.
+        self.assertEqual(sorted(self.member_rows('guild')), ['channel', 'm1', 'm2', 'settings'])
+
+    def test_remove_path_round_trip(self):
+        db = self.open_sqlite()
+        self.run_async(db.put('guild', {'channel': 'c', 'm1': 1, 'm2': 2, 'settings': {'a': 1, 'b': 2}}))
+        self.run_async(db.remove_path(('guild', 'm1')))
+        self.run_async(db.remove_path(('guild', 'settings', 'a')))
+        self.run_async(db.remove_path(('guild', 'missing')))
+        self.run_async(db.remove_path(('guild', 'missing', 'deeper')))
+        expected = {'guild': {'channel': 'c', 'm2': 2, 'settings': {'b': 2}}}
+        self.assertEqual(dict(db.all()), expected)
+        self.assertEqual(self.reopen_sqlite(db), expected)
+
+        db = self.open_sqlite()
+        self.run_async(db.remove_path(('guild', 'channel')))
+        self.run_async(db.remove_path(('guild', 'm2')))
+        self.run_async(db.remove_path(('guild', 'settings')))
+        self.assertEqual(self.reopen_sqlite(db), {'guild': {}})
+
+        db = self.open_sqlite()
+        self.run_async(db.put_path(('guild', 'm3'), 3))
+        self.run_async(db.remove('guild'))
+        self.assertEqual(self.reopen_sqlite(db), {})
+        self.assertEqual(self.member_rows('guild'), {})
+
+    def test_put_replaces_members(self):
+        db = self.open_sqlite()
+        self.run_async(db.put('guild', {'a': 1, 'b': 2}))
+        self.run_async(db.put('guild', {'c': 3}))
+        self.assertEqual(self.reopen_sqlite(db), {'guild': {'c': 3}})
+
+        db = self.open_sqlite()
+        self.run_async(db.put('guild', 'not a dict anymore'))
+        self.assertEqual(self.reopen_sqlite(db), {'guild': 'not a dict anymore'})
+        self.assertEqual(self.member_rows('guild'), {})
+
+    def test_object_hook_sees_whole_dicts(self):
+        seen = []
+
+        def object_hook(value):
+            seen.append(sorted(value))
+            return value
+
+        db = self.open_sqlite()
+        self.run_async(db.put('guild', {'a': 1}))
+        self.run_async(db.put_path(('guild', 'b'), 2))
+        self.run_async(db.close())
+
+        db = self.open_sqlite(object_hook=object_hook)
+        self.assertIn(['a', 'b'], seen)
+        self.run_async(db.close())
+
+
+class LazyTest(DatabaseTestCase):
+    def open_lazy(self, **options):
+        return self.open('sqlite.db', backend=database.SQLiteBackend, lazy=True, **options)
+
+    def test_entries_load_when_used(self):
+        db = self.open_lazy()
+        self.run_async(db.put('guild', {'channel': 'c'}))
+        self.run_async(db.put_path(('guild', 'm1'), [1]))
+        self.run_async(db.close())
+
+        db = self.open_lazy()
+        self.assertIn('guild', db)
+        self.assertEqual(len(db), 1)
+        self.assertEqual(db._db, {})
+        self.assertEqual(db.get('guild'), {'channel': 'c', 'm1': [1]})
+        self.assertIsNone(db.get('missing'))
+        self.run_async(db.close())
+
+    def test_idle_entries_are_evicted(self):
+        db = self.open_lazy(evict_after=0.05)
+        self.run_async(db.put('a', {'x': 1}))
+        self.run_async(db.put('b', {'x': 2}))
+        db.create_index('x', lambda key, value: [(value['x'], key)])
+
+        for _ in range(4):
+            self.run_async(asyncio.sleep(0.03))
+            db.get('b')
+        self.assertNotIn('a', db._db)
+        self.assertIn('b', db._db)
+        self.assertIsNone(db.lookup('x', 1))
+
+        # Still stored and loaded again when used.
+        self.assertIn('a', db)
+        self.assertEqual(db.get('a'), {'x': 1})
+        self.assertEqual(db.lookup('x', 1), 'a')
+        self.run_async(db.close())
+
+    def test_json_backend_cannot_load_lazily(self):
+        with self.assertRaises(ValueError):
+            self.open('lazy.json', lazy=True)
+
+
+class IndexTest(DatabaseTestCase):
+    def test_index(self):
+        db = self.open('index.json')
+        db.create_index('by_name', lambda key, value: [(value['name'], key)])
+        self.run_async(db.put('1', {'name': 'a'}))
+        self.run_async(db.put('2', {'name': 'b'}))
+        self.run_async(db.put('1', {'name': 'c'}))
+        self.assertEqual(db.lookup('by_name', 'c'), '1')
+        self.assertIsNone(db.lookup('by_name', 'a'))
+
+        self.run_async(db.remove('2'))
+        self.assertIsNone(db.lookup('by_name', 'b'))
+        self.run_async(db.close())
+
+        # Built again when the database is loaded.
+        db = self.open('index.json')
+        db.create_index('by_name', lambda key, value: [(value['name'], key)])
+        self.assertEqual(db.lookup('by_name', 'c'), '1')
+        self.run_async(db.close())
+
+    def test_nested_index(self):
+        calls = []
+
+        def starred(guild_id, message_id, entry):
+            calls.append(message_id)
+            if message_id != 'channel':
+                yield entry[0], (guild_id, message_id)
+
+        db = self.open('index.json')
+        db.create_index('stars', starred, nested=True)
+        self.run_async(db.put('g', {'channel': 'c', 'm1': ['s1', []], 'm2': ['s2', []]}))
+        self.assertEqual(db.lookup('stars', 's2'), ('g', 'm2'))
+
+        # Only the member that changed is indexed again.
+        del calls[:]
+        self.run_async(db.put_path(('g', 'm3'), ['s3', []]))
+        self.run_async(db.put_path(('g', 'm1', 1), ['user']))
+        self.assertEqual(calls, ['m3', 'm1'])
+        self.assertEqual(db.lookup('stars', 's3'), ('g', 'm3'))
+        self.assertEqual(db.lookup('stars', 's1'), ('g', 'm1'))
+
+        self.run_async(db.put_path(('g', 'm3'), ['s4', []]))
+        self.assertIsNone(db.lookup('stars', 's3'))
+        self.assertEqual(db.lookup('stars', 's4'), ('g', 'm3'))
+
+        self.run_async(db.remove_path(('g', 'm1')))
+        self.assertIsNone(db.lookup('stars', 's1'))
+        self.assertEqual(db.lookup('stars', 's2'), ('g', 'm2'))
+
+        self.run_async(db.remove('g'))
+        self.assertEqual(db._indexes['stars'].entries, {})
+        self.run_async(db.close())
+
+
+class CoalescingTest(DatabaseTestCase):
+    def open_flaky(self, flush_interval=60.0):
+        return self.open('log.json', backend=FlakyLogBackend, flush_interval=flush_interval)
+
+    def test_one_write_per_interval(self):
+        db = self.open_flaky(flush_interval=0.05)
+        for i in range(10):
+            self.run_async(db.put('key', i))
+        self.run_async(db.put('other', 'x'))
+        self.assertEqual(db.backend.writes, [])
+
+        self.run_async(asyncio.sleep(0.15))
+        self.assertEqual(len(db.backend.writes), 1)
+        self.assertEqual(len(db.backend.writes[0]), 2)
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'key': 9, 'other': 'x'})
+
+    def test_flush_keeps_the_last_change_per_key(self):
+        db = self.open_flaky()
+        self.run_async(db.put('a', {'x': 1}))
+        self.run_async(db.put_path(('a', 'y'), 2))
+        self.run_async(db.put('a', {'z': 3}))
+        self.run_async(db.put('b', 1))
+        self.run_async(db.remove('b'))
+        self.run_async(db.put_path(('c', 'x'), 1))
+        self.run_async(db.remove_path(('c', 'x')))
+        self.run_async(db.put('d', 1))
+        expected = dict(db.all())
+
+        # A put_path creates 'c', so it goes out along with its remove_path.
+        self.run_async(db.flush())
+        self.assertEqual(len(db.backend.writes[0]), 6)
+        self.assertEqual(self.reopen(db, 'log.json', log=True), expected)
+
+    def test_deep_put_path_keeps_the_dict_it_created(self):
+        backends = [('log.json', database.LogBackend), ('sqlite.db', database.SQLiteBackend)]
+        for name, backend in backends:
+            with self.subTest(backend=backend.__name__):
+                db = self.open(name, backend=backend, flush_interval=60.0)
+                self.run_async(db.put_path(('a', 'b', 'c'), 1))
+                self.run_async(db.remove_path(('a', 'b')))
+                self.assertEqual(dict(db.all()), {'a': {}})
+                self.assertEqual(self.reopen(db, name, backend=backend), {'a': {}})
+
+    def test_path_change_after_put_comes_after_it(self):
+        db = self.open_flaky()
+        self.run_async(db.put('a', {'x': 1}))
+        self.run_async(db.put_path(('a', 'y'), 2))
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': {'x': 1, 'y': 2}})
+
+    def test_failed_flush_is_retried(self):
+        db = self.open_flaky()
+        db.backend.failures = 1
+        self.run_async(db.put('a', 1))
+        waiter = self.loop.create_task(db.put('b', 2, durable=True))
+        self.run_async(asyncio.sleep(0))
+
+        with self.assertRaises(OSError):
+            self.run_async(db.flush())
+        self.assertFalse(waiter.done())
+        self.assertEqual(len(db._pending), 2)
+
+        # Changes made after the failure go out after the ones that failed.
+        self.run_async(db.put('a', 3))
+        self.run_async(db.flush())
+        self.run_async(asyncio.sleep(0))
+        self.assertTrue(waiter.done())
+        self.assertIsNone(waiter.result())
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': 3, 'b': 2})
+
+    def test_failed_flush_is_retried_by_the_flusher(self):
+        db = self.open_flaky(flush_interval=0.05)
+        db.backend.failures = 1
+        self.run_async(db.put('a', 1))
+
+        with mock.patch.object(database.traceback, 'print_exc') as print_exc:
+            self.run_async(asyncio.sleep(0.2))
+        self.assertEqual(print_exc.call_count, 1)
+        self.assertEqual(len(db.backend.writes), 1)
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': 1})
+
+
+class CloseTest(DatabaseTestCase):
+    def test_close_flushes(self):
+        db = self.open('log.json', log=True, flush_interval=60.0)
+        self.run_async(db.put('a', 1))
+        self.run_async(db.put_path(('b', 'x'), 2))
+        self.assertEqual(self.reopen(db, 'log.json', log=True), {'a': 1, 'b': {'x': 2}})
+
+    def test_close_flushes_sqlite(self):
+        db = self.open('sqlite.db', backend=database.SQLiteBackend, flush_interval=60.0)
+        self.run_async(db.put('a', {'x': 1}))
+        self.run_async(db.put_path(('a', 'y'), 2))
+        self.assertEqual(self.reopen(db, 'sqlite.db', backend=database.SQLiteBackend), {'a': {'x': 1, 'y': 2}})
+
+    def test_close_waits_for_writes_in_progress(self):
+        db = self.open('log.json', backend=SlowLogBackend)
+        saving = self.loop.create_task(db.put('a', 1))
+        self.run_async(self.loop.run_in_executor(None, db.backend.writing.wait))
+
+        self.run_async(db.close())
+        self.assertTrue(saving.done())
+        self.assertFalse(db.backend.closed_while_writing)
+        self.assertEqual(self.contents('log.json', log=True), {'a': 1})
+
+    def test_close_waits_for_the_flusher(self):
+        db = self.open('log.json', backend=SlowLogBackend, flush_interval=0.01)
+        self.run_async(db.put('a', 1))
+        self.run_async(self.loop.run_in_executor(None, db.backend.writing.wait))
+
+        # Queued while the flusher is writing.
+        self.run_async(db.put('b', 2))
+        self.run_async(db.close())
+        self.assertFalse(db.backend.closed_while_writing)
+        self.assertEqual(self.contents('log.json', log=True), {'a': 1, 'b': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Tests for Cogs/Utils/hedge.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from Cogs.Utils import hedge
+
+
+class HedgedFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.calls = []
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def source(self, name, answer, delay=0.0):
+        """A source answering ``answer`` after ``delay``, raising it if it's an exception."""
+        async def fetch(*args):
+            self.calls.append((name, args))
+            await asyncio.sleep(delay)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+        return fetch
+
+    def fetcher(self, *sources, hedge_after=0.01):
+        """Takes ``(name, answer, delay)`` tuples, sources that weren't timed yet are asked in this order."""
+        sources = OrderedDict((source[0], self.source(*source)) for source in sources)
+        return hedge.HedgedFetcher(sources, hedge_after=hedge_after, loop=self.loop)
+
+    def test_fastest_answer_wins(self):
+        fetcher = self.fetcher(('a', 'slow', 0.2), ('b', 'fast'))
+        self.assertEqual(self.run_async(fetcher.fetch(1)), 'fast')
+        self.assertEqual(self.calls, [('a', (1,)), ('b', (1,))])
+        self.assertEqual(fetcher.hedges, 1)
+        self.assertEqual(fetcher.wins, {'b': 1})
+
+        # The slow source was timed until it lost, and is asked second now.
+        self.assertGreaterEqual(fetcher.latency['a'], 0.01)
+        self.assertEqual(fetcher.ranked(), ['b', 'a'])
+
+    def test_fast_answers_arent_hedged(self):
+        fetcher = self.fetcher(('a', 'fast'), ('b', 'unused'))
+        self.assertEqual(self.run_async(fetcher.fetch()), 'fast')
+        self.assertEqual([name for name, args in self.calls], ['a'])
+        self.assertEqual(fetcher.hedges, 0)
+
+    def test_failures_ask_the_next_source_at_once(self):
+        fetcher = self.fetcher(('a', ValueError('down')), ('b', None), ('c', 'answer'), hedge_after=10.0)
+        with mock.patch.object(hedge.traceback, 'print_exc') as print_exc:
+            self.assertEqual(self.run_async(asyncio.wait_for(fetcher.fetch(), 1.0)), 'answer')
+        self.assertEqual(print_exc.call_count, 1)
+        self.assertEqual(fetcher.hedges, 0)
+        self.assertEqual(fetcher.latency['a'], fetcher.failure_penalty)
+        self.assertEqual(fetcher.latency['b'], fetcher.failure_penalty)
+        self.assertEqual(fetcher.ranked()[0], 'c')
+
+    def test_nobody_has_it(self):
+        fetcher = self.fetcher(('a', None), ('b', None, 0.05))
+        self.assertIsNone(self.run_async(fetcher.fetch()))
+        self.assertEqual(fetcher.wins, {})
+
+    def test_latency_is_averaged(self):
+        fetcher = hedge.HedgedFetcher({}, alpha=0.5, loop=self.loop)
+        fetcher.observe('a', 1.0)
+        fetcher.observe('a', 2.0)
+        fetcher.observe('a', 2.0)
+        self.assertEqual(fetcher.latency['a'], 1.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Tests for Cogs/Utils/ingester.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import unittest
+
+from Cogs.Utils import ingester, ratelimit, steamapi
+
+
+class State(dict):
+    """Stands in for the state database."""
+
+    async def put(self, key, value):
+        self[key] = value
+
+
+class FakeSteamAPI:
+    """Knows about ``count`` matches with sequence numbers from 1, player ``n`` playing in match ``n``."""
+
+    def __init__(self, count):
+        self.matches = [{'match_seq_num': n, 'match_id': 1000 + n, 'radiant_win': True,
+                         'players': [{'account_id': n}, {'account_id': 0}]}
+                        for n in range(1, count + 1)]
+        self.failures = 0
+        self.priorities = []
+
+    async def get_match_history(self, matches_requested=None, priority=ratelimit.HIGH):
+        self.priorities.append(priority)
+        return {'result': {'matches': self.matches[-1:]}}
+
+    async def get_match_history_by_seq_num(self, start_at_match_seq_num=None, matches_requested=None,
+                                           priority=ratelimit.HIGH):
+        self.priorities.append(priority)
+        if self.failures:
+            self.failures -= 1
+            raise steamapi.SteamAPIUnavailable('GetMatchHistoryBySequenceNum is failing')
+        matches = [match for match in self.matches if match['match_seq_num'] >= start_at_match_seq_num]
+        return {'result': {'status': 1, 'matches': matches[:matches_requested]}}
+
+
+class FakeStore:
+    def __init__(self):
+        self.matches = []
+
+    def put(self, match):
+        self.matches.append(match['match_id'])
+
+
+class MatchIngesterTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.steam_api = FakeSteamAPI(ingester.PAGE_SIZE + 10)
+        self.state = State(next_seq_num=1)
+        self.store = FakeStore()
+        self.ingester = ingester.MatchIngester(self.steam_api, self.state, match_store=self.store,
+                                               idle_delay=0.01, error_delay=0.01)
+        self.events = []
+        self.ingester.on('match', lambda match, account_ids: self.events.append((match['match_id'], account_ids)))
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_pages(self):
+        self.assertTrue(self.run_async(self.ingester.ingest_page()))
+        self.assertEqual(self.state['next_seq_num'], ingester.PAGE_SIZE + 1)
+        self.assertFalse(self.run_async(self.ingester.ingest_page()))
+        self.assertEqual(self.state['next_seq_num'], ingester.PAGE_SIZE + 11)
+
+        # Nothing new, so nothing moves.
+        self.assertFalse(self.run_async(self.ingester.ingest_page()))
+        self.assertEqual(self.state['next_seq_num'], ingester.PAGE_SIZE + 11)
+        self.assertEqual((self.ingester.pages, self.ingester.matches), (3, ingester.PAGE_SIZE + 10))
+        self.assertEqual(set(self.steam_api.priorities), {ratelimit.LOW})
+
+    def test_only_watched_matches_are_reported(self):
+        self.ingester.watched = {5, 105, 1000}
+        self.run_async(self.ingester.ingest_page())
+        self.run_async(self.ingester.ingest_page())
+        self.assertEqual(self.events, [(1005, {5}), (1105, {105})])
+        self.assertEqual(self.store.matches, [1005, 1105])
+        self.assertEqual(self.ingester.reported, 2)
+
+    def test_run_starts_at_the_newest_match(self):
+        del self.state['next_seq_num']
+        self.steam_api.failures = 1
+        self.ingester.watched = {ingester.PAGE_SIZE + 10}
+        running = self.loop.create_task(self.ingester.run())
+        self.run_async(asyncio.sleep(0.05))
+        running.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            self.run_async(running)
+
+        # Carried on after Steam failed once.
+        self.assertEqual(self.events, [(1000 + ingester.PAGE_SIZE + 10, {ingester.PAGE_SIZE + 10})])
+        self.assertEqual(self.state['next_seq_num'], ingester.PAGE_SIZE + 11)
+
+    def test_refused_pages_raise(self):
+        async def refuse(**args):
+            return {'result': {'status': 8, 'statusDetail': 'Error retrieving match data.'}}
+
+        self.steam_api.get_match_history_by_seq_num = refuse
+        with self.assertRaises(ValueError):
+            self.run_async(self.ingester.ingest_page())
+        self.assertEqual(self.state['next_seq_num'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Tests for Cogs/Utils/matchstore.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from Cogs.Utils.matchstore import ANONYMOUS_ACCOUNT_ID, MatchStore
+
+
+def match(match_id, *account_ids, **fields):
+    players = [{'account_id': account_id, 'hero_id': 1} for account_id in account_ids]
+    return dict({'match_id': match_id, 'start_time': 1000 + match_id, 'radiant_win': True, 'players': players},
+                **fields)
+
+
+class MatchStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='matchtest')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.store = self.open()
+
+    def tearDown(self):
+        self.store.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        return MatchStore(os.path.join(self.directory, 'matches.db'), loop=self.loop)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_round_trip(self):
+        stored = match(1, 10, 20)
+        self.run_async(self.store.put(stored))
+        self.assertEqual(self.run_async(self.store.get(1)), stored)
+        self.assertEqual(self.run_async(self.store.get('1')), stored)
+        self.assertIsNone(self.run_async(self.store.get(2)))
+
+    def test_survives_reopening(self):
+        stored = match(1, 10)
+        self.store.put(stored)
+        self.store.close()
+
+        self.store = self.open()
+        self.assertEqual(self.run_async(self.store.get(1)), stored)
+        self.assertEqual(self.run_async(self.store.account_matches(10)), [1])
+
+    def test_account_matches(self):
+        for match_id in (3, 1, 2):
+            self.store.put(match(match_id, 10, ANONYMOUS_ACCOUNT_ID))
+        self.store.put(match(4, 20))
+        self.store.put(match(5, 10, 20))
+
+        self.assertEqual(self.run_async(self.store.account_matches(10)), [5, 3, 2, 1])
+        self.assertEqual(self.run_async(self.store.account_matches(10, limit=2)), [5, 3])
+        self.assertEqual(self.run_async(self.store.account_matches(20)), [5, 4])
+        self.assertEqual(self.run_async(self.store.account_matches(ANONYMOUS_ACCOUNT_ID)), [])
+
+    def test_unfinished_matches_arent_stored(self):
+        self.assertIsNone(self.store.put({'match_id': 1, 'players': []}))
+        self.assertIsNone(self.store.put(match(2, error='Match ID not found')))
+        self.assertIsNone(self.store.put(None))
+        self.assertIsNone(self.run_async(self.store.get(1)))
+        self.assertIsNone(self.run_async(self.store.get(2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""Tests for Cogs/Utils/nodebridge.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import json
+import unittest
+
+from Cogs.Utils import nodebridge
+
+
+class FakeBridge:
+    """Speaks the JSON lines protocol of Node/mt5abot-node.js on a local port.
+
+    Every request is answered by the method of the same name, which is
+    handed the writer so it can misbehave.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.requests = []
+        self.connections = 0
+        self.writers = []
+        self.tasks = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        for writer in self.writers:
+            writer.close()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        self.writers.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = json.loads(line.decode())
+            self.requests.append(request)
+            self.tasks.append(self.loop.create_task(self.answer(request, writer)))
+
+    async def answer(self, request, writer):
+        result, error = await getattr(self, request['method'])(writer, *request['args'])
+        if writer.transport.is_closing():
+            return
+        writer.write(json.dumps({'id': request['id'], 'error': error, 'result': result}).encode() + b'\n')
+
+    async def echo(self, writer, *args):
+        return list(args), None
+
+    async def slow(self, writer, delay, result):
+        await asyncio.sleep(delay)
+        return result, None
+
+    async def fail(self, writer):
+        return None, 'GC not ready'
+
+    async def garbled(self, writer):
+        writer.write(b'not json\n')
+        return 'ok', None
+
+    async def drop(self, writer):
+        writer.close()
+        return None, None
+
+    async def get_mmr_for_dotaids(self, writer, dotaids, fresh):
+        if not dotaids:
+            return False, None
+        # The first account hides its profile card.
+        return {dotaid: [4000, 3500] if i else None for i, dotaid in enumerate(dotaids)}, None
+
+
+class NodeBridgeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = FakeBridge(self.loop)
+        port = self.run_async(self.server.start())
+        self.bridge = nodebridge.NodeBridge(port=port, timeout=1.0, loop=self.loop)
+
+    def tearDown(self):
+        self.bridge.close()
+        self.run_async(self.server.close())
+        # Lets the bridge's reader finish after being cancelled.
+        self.run_async(asyncio.sleep(0.01))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+class NodeBridgeTest(NodeBridgeTestCase):
+    def test_call(self):
+        self.assertEqual(self.run_async(self.bridge.call('echo', 'a', 1)), ['a', 1])
+        self.assertEqual(self.server.requests[0]['method'], 'echo')
+        self.assertEqual(self.server.requests[0]['timeout'], 1000)
+        self.assertEqual(self.bridge.pending, {})
+
+    def test_calls_share_the_connection(self):
+        results = self.run_async(asyncio.gather(self.bridge.call('slow', 0.05, 'first'),
+                                                self.bridge.call('slow', 0.0, 'second'),
+                                                self.bridge.call('echo', 'third')))
+        self.assertEqual(results, ['first', 'second', ['third']])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_errors(self):
+        with self.assertRaises(nodebridge.NodeError) as raised:
+            self.run_async(self.bridge.call('fail'))
+        self.assertEqual(str(raised.exception), 'GC not ready')
+
+    def test_bad_replies_are_skipped(self):
+        self.assertEqual(self.run_async(self.bridge.call('garbled')), 'ok')
+
+    def test_timeouts(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_async(self.bridge.call('slow', 0.2, 'late', timeout=0.05))
+        self.assertEqual(self.server.requests[0]['timeout'], 50)
+        self.assertEqual(self.bridge.pending, {})
+
+        # The late reply is dropped and the connection keeps working.
+        self.run_async(asyncio.sleep(0.2))
+        self.assertEqual(self.run_async(self.bridge.call('echo', 'x')), ['x'])
+
+    def test_lost_connection(self):
+        waiting = self.loop.create_task(self.bridge.call('slow', 0.5, 'never'))
+        with self.assertRaises(nodebridge.NodeUnavailable):
+            self.run_async(self.bridge.call('drop'))
+        with self.assertRaises(nodebridge.NodeUnavailable):
+            self.run_async(waiting)
+        self.assertFalse(self.bridge.connected)
+
+        # Connects again on the next call.
+        self.assertEqual(self.run_async(self.bridge.call('echo', 'back')), ['back'])
+        self.assertEqual(self.server.connections, 2)
+
+    def test_bridge_not_running(self):
+        self.run_async(self.server.close())
+        with self.assertRaises(nodebridge.NodeUnavailable):
+            self.run_async(self.bridge.call('echo'))
+
+
+class MMRTest(NodeBridgeTestCase):
+    def test_get_mmr_for_dotaids(self):
+        mmrs = self.run_async(self.bridge.get_mmr_for_dotaids([1, 2, 3]))
+        self.assertEqual(mmrs, {1: None, 2: (4000, 3500), 3: (4000, 3500)})
+        self.assertEqual(self.server.requests[0]['args'], [['1', '2', '3'], False])
+
+    def test_gc_not_ready(self):
+        self.assertIsNone(self.run_async(self.bridge.get_mmr_for_dotaids([], fresh=True)))
+        self.assertEqual(self.server.requests[0]['args'], [[], True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Tests for Cogs/Utils/ratelimit.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import unittest
+
+from Cogs.Utils.ratelimit import HIGH, LOW, RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def limiter(self, rate=100.0, burst=2):
+        # Timed by the loop so refills and wakeups agree.
+        return RateLimiter(rate, burst, loop=self.loop, timer=self.loop.time)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_burst_then_rate(self):
+        limiter = self.limiter(rate=20.0, burst=3)
+        start = self.loop.time()
+        self.run_async(asyncio.gather(*[limiter.acquire() for _ in range(3)]))
+        self.assertLess(self.loop.time() - start, 0.02)
+
+        self.run_async(asyncio.gather(*[limiter.acquire() for _ in range(2)]))
+        self.assertGreaterEqual(self.loop.time() - start, 0.09)
+
+    def test_high_priority_goes_first(self):
+        limiter = self.limiter(burst=1)
+        self.run_async(limiter.acquire())
+        order = []
+
+        async def acquire(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        self.run_async(asyncio.gather(acquire('low1', LOW), acquire('low2', LOW), acquire('high', HIGH)))
+        self.assertEqual(order, ['high', 'low1', 'low2'])
+
+    def test_waiting_requests_arent_overtaken(self):
+        for priority in (HIGH, LOW):
+            with self.subTest(priority=priority):
+                limiter = self.limiter(burst=1)
+                self.run_async(limiter.acquire())
+                waiting = self.loop.create_task(limiter.acquire(HIGH))
+                self.run_async(asyncio.sleep(0))
+
+                # A token came in before the waiting request was woken up for it.
+                limiter.tokens = 1.0
+                late = self.loop.create_task(limiter.acquire(priority))
+                self.run_async(asyncio.sleep(0))
+                self.assertFalse(late.done())
+                self.run_async(asyncio.gather(waiting, late))
+
+    def test_stats(self):
+        limiter = self.limiter(burst=1)
+        self.run_async(limiter.acquire())
+        waiters = [self.loop.create_task(limiter.acquire(LOW)) for _ in range(3)]
+        self.run_async(asyncio.sleep(0))
+
+        stats = limiter.stats()
+        self.assertEqual(stats['high'], {'queued': 0, 'served': 1, 'wait_avg': 0.0, 'wait_max': 0.0})
+        self.assertEqual(stats['low']['queued'], 3)
+
+        self.run_async(asyncio.gather(*waiters))
+        stats = limiter.stats()
+        self.assertEqual(stats['low']['queued'], 0)
+        self.assertEqual(stats['low']['served'], 3)
+        self.assertGreater(stats['low']['wait_max'], stats['low']['wait_avg'])
+
+    def test_cancelled_waiters_are_skipped(self):
+        limiter = self.limiter(burst=1)
+        self.run_async(limiter.acquire())
+        first = self.loop.create_task(limiter.acquire())
+        second = self.loop.create_task(limiter.acquire())
+        self.run_async(asyncio.sleep(0))
+        self.assertEqual(limiter.stats()['high']['queued'], 2)
+
+        first.cancel()
+        self.assertEqual(limiter.stats()['high']['queued'], 1)
+        self.run_async(second)
+        # The token the cancelled request would have had wasn't used up.
+        self.assertEqual(limiter.stats()['high']['served'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,462 @@
+"""Tests for Cogs/Utils/steamapi.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import asyncio
+import json
+import unittest
+
+from Cogs.Utils import ratelimit, steamapi, urls
+from Cogs.Utils.cache import TTLCache
+
+
+class FakeResponse:
+    def __init__(self, body, status=200, delay=0.0):
+        self.body = body
+        self.status = status
+        self.reason = 'OK' if status < 400 else 'Error'
+        self.delay = delay
+        self.raw = json.dumps(body).encode() if body is not None else b'<html></html>'
+        self.headers = {'Content-Length': str(len(self.raw))}
+
+    async def __aenter__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def read(self):
+        return self.raw
+
+    async def json(self):
+        if self.body is None:
+            raise ValueError('not json')
+        return self.body
+
+
+class FakeSession:
+    """Stands in for the aiohttp session, answering every request with ``respond(endpoint, params)``."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def get(self, url, params=None):
+        endpoint = steamapi.SteamAPI.endpoint_name(url)
+        self.requests.append((endpoint, dict(params)))
+        response = self.respond(endpoint, params)
+        if isinstance(response, Exception):
+            raise response
+        if not isinstance(response, FakeResponse):
+            response = FakeResponse(response)
+        return response
+
+    def close(self):
+        pass
+
+
+def echo(endpoint, params):
+    return {'result': {'endpoint': endpoint, 'params': params}}
+
+
+class SteamAPITestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def make_api(self, respond=echo, **options):
+        api = steamapi.SteamAPI('secret', loop=self.loop, **options)
+        api.session.close()
+        api.session = self.session = FakeSession(respond)
+        self.addCleanup(api.close)
+        return api
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def requests_to(self, endpoint):
+        return [params for name, params in self.session.requests if name == endpoint]
+
+
+class SteamAPITest(SteamAPITestCase):
+    def test_arguments(self):
+        api = self.make_api()
+        result = self.run_async(api.get_match_history(account_id=1234, matches_requested=5,
+                                                      tournament_games_only=True))['result']
+        self.assertEqual(result['endpoint'], 'GetMatchHistory')
+        self.assertEqual(result['params'], {'account_id': '1234', 'matches_requested': '5',
+                                            'tournament_games_only': '1', 'key': 'secret'})
+
+    def test_lists_are_comma_separated(self):
+        self.assertEqual(steamapi.SteamAPI.format_arg([1, 2, 3]), '1,2,3')
+        self.assertEqual(steamapi.SteamAPI.format_arg(False), '0')
+        self.assertEqual(steamapi.SteamAPI.format_arg('x'), 'x')
+
+    def test_raw_request(self):
+        api = self.make_api()
+        response = self.run_async(api.get_heroes(raw_request=True))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(response.raw.decode())['result']['endpoint'], 'GetHeroes')
+
+    def test_error_pages(self):
+        api = self.make_api(lambda endpoint, params: FakeResponse(None, status=403))
+        self.assertEqual(self.run_async(api.get_live_league_games()), {})
+
+
+class CacheTest(SteamAPITestCase):
+    def test_responses_are_cached(self):
+        api = self.make_api()
+        first = self.run_async(api.get_match_details(match_id=1))
+        second = self.run_async(api.get_match_details(match_id=1))
+        self.assertIs(first, second)
+        self.run_async(api.get_match_details(match_id=2))
+        self.assertEqual(len(self.requests_to('GetMatchDetails')), 2)
+        self.assertEqual(api.cache_stats()['GetMatchDetails'], (1, 2, 2))
+
+    def test_uncached_endpoints(self):
+        api = self.make_api()
+        self.run_async(api.get_live_league_games())
+        self.run_async(api.get_live_league_games())
+        self.assertEqual(len(self.requests_to('GetLiveLeagueGames')), 2)
+
+    def test_errors_are_not_cached(self):
+        answers = [{'result': {'error': 'Match ID not found'}}, {'result': {'match_id': 1}}]
+        api = self.make_api(lambda endpoint, params: answers.pop(0))
+        self.run_async(api.get_match_details(match_id=1))
+        self.assertEqual(self.run_async(api.get_match_details(match_id=1)), {'result': {'match_id': 1}})
+        self.assertEqual(len(self.requests_to('GetMatchDetails')), 2)
+
+    def test_clear_cache(self):
+        api = self.make_api()
+        self.run_async(api.get_heroes())
+        api.clear_cache(urls.GET_HEROES)
+        self.run_async(api.get_heroes())
+        self.assertEqual(len(self.requests_to('GetHeroes')), 2)
+
+
+class UsageTest(SteamAPITestCase):
+    def usage(self, api, endpoint='GetLiveLeagueGames', lane='high'):
+        return api.usage.window(60)[(endpoint, lane)]
+
+    def test_requests_are_recorded(self):
+        api = self.make_api(answers({'result': 1}, FakeResponse(None, status=403), asyncio.TimeoutError()))
+        self.run_async(api.get_live_league_games())
+        self.run_async(api.get_live_league_games())
+        with self.assertRaises(steamapi.SteamAPIUnavailable):
+            self.run_async(api.get_live_league_games(priority=ratelimit.LOW))
+
+        self.assertEqual(self.usage(api).calls, 2)
+        self.assertEqual(dict(self.usage(api).errors), {403: 1})
+        self.assertEqual(dict(self.usage(api, lane='low').errors), {'TimeoutError': 1})
+
+    def test_wire_sizes_are_recorded(self):
+        compressed = FakeResponse({'result': 'x' * 100})
+        compressed.headers['Content-Length'] = '20'
+        chunked = FakeResponse({'result': 1})
+        del chunked.headers['Content-Length']
+        api = self.make_api(answers(compressed, chunked))
+        self.run_async(api.get_live_league_games())
+        self.run_async(api.get_live_league_games())
+        self.assertEqual(self.usage(api).bytes, 20 + len(chunked.raw))
+
+    def test_losing_hedges_arent_errors(self):
+        api = self.make_api(answers(FakeResponse({'result': 'slow'}, delay=0.2), {'result': 'fast'}),
+                            hedge_after=0.01)
+        self.run_async(api.get_live_league_games())
+        self.assertEqual(self.usage(api).calls, 2)
+        self.assertEqual(dict(self.usage(api).errors), {})
+
+
+class FakeStore:
+    """Keeps matches like a MatchStore, but in memory."""
+
+    def __init__(self, *matches):
+        self.matches = {match['match_id']: match for match in matches}
+
+    async def get(self, match_id):
+        return self.matches.get(int(match_id))
+
+    def put(self, match):
+        self.matches[match['match_id']] = match
+
+
+class MatchStoreTest(SteamAPITestCase):
+    def test_stored_matches_arent_fetched(self):
+        store = FakeStore({'match_id': 1, 'radiant_win': True})
+        api = self.make_api(match_store=store)
+        self.assertEqual(self.run_async(api.get_match_details(match_id=1)),
+                         {'result': {'match_id': 1, 'radiant_win': True}})
+        self.assertEqual(self.session.requests, [])
+
+    def test_fetched_matches_are_stored(self):
+        store = FakeStore()
+        api = self.make_api(lambda endpoint, params: {'result': {'match_id': int(params['match_id'])}},
+                            match_store=store)
+        self.run_async(api.get_match_details(match_id=2))
+        self.assertEqual(store.matches, {2: {'match_id': 2}})
+
+    def test_errors_arent_stored(self):
+        store = FakeStore()
+        api = self.make_api(lambda endpoint, params: {'result': {'error': 'Match ID not found'}},
+                            match_store=store)
+        self.run_async(api.get_match_details(match_id=3))
+        self.assertEqual(store.matches, {})
+
+
+class CoalescingTest(SteamAPITestCase):
+    def slow(self, endpoint, params):
+        return FakeResponse(echo(endpoint, params), delay=0.05)
+
+    def test_identical_calls_share_a_request(self):
+        api = self.make_api(self.slow)
+        results = self.run_async(asyncio.gather(*[api.get_live_league_games() for _ in range(5)]))
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertEqual(api.coalesced, 4)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(api.in_flight, {})
+
+    def test_different_calls_dont(self):
+        api = self.make_api(self.slow)
+        self.run_async(asyncio.gather(api.get_match_history(account_id=1), api.get_match_history(account_id=2)))
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(api.coalesced, 0)
+
+    def test_raw_requests_dont(self):
+        api = self.make_api(self.slow)
+        self.run_async(asyncio.gather(api.get_live_league_games(raw_request=True),
+                                      api.get_live_league_games(raw_request=True)))
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_background_calls_join_user_calls(self):
+        api = self.make_api(self.slow)
+        self.run_async(asyncio.gather(api.get_live_league_games(),
+                                      api.get_live_league_games(priority=ratelimit.LOW)))
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertEqual(api.coalesced, 1)
+
+    def test_user_calls_dont_wait_on_background_calls(self):
+        api = self.make_api(self.slow)
+        self.run_async(asyncio.gather(api.get_live_league_games(priority=ratelimit.LOW),
+                                      api.get_live_league_games()))
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(api.coalesced, 0)
+
+    def test_giving_up_leaves_the_request_to_the_others(self):
+        api = self.make_api(self.slow)
+        first = self.loop.create_task(api.get_live_league_games())
+        second = self.loop.create_task(api.get_live_league_games())
+        self.run_async(asyncio.sleep(0.01))
+        first.cancel()
+
+        self.assertEqual(self.run_async(second)['result']['endpoint'], 'GetLiveLeagueGames')
+        self.assertTrue(first.cancelled())
+        self.assertEqual(len(self.session.requests), 1)
+
+
+def answers(*responses):
+    """Answers requests with ``responses`` in turn and the last one after that."""
+    responses = list(responses)
+
+    def respond(endpoint, params):
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+    return respond
+
+
+class ResilienceTest(SteamAPITestCase):
+    def make_api(self, respond=echo, **options):
+        options.setdefault('backoff_base', 0.001)
+        return super().make_api(respond, **options)
+
+    def test_failures_are_retried(self):
+        api = self.make_api(answers(FakeResponse(None, status=503), asyncio.TimeoutError(), {'result': 1}),
+                            attempts=3)
+        self.assertEqual(self.run_async(api.get_live_league_games()), {'result': 1})
+        self.assertEqual(len(self.session.requests), 3)
+        self.assertFalse(api.breaker(urls.GET_LIVE_LEAGUE_GAMES).failures)
+
+    def test_running_out_of_attempts(self):
+        api = self.make_api(answers(asyncio.TimeoutError()), attempts=2)
+        with self.assertRaises(steamapi.SteamAPIUnavailable) as raised:
+            self.run_async(api.get_live_league_games())
+        self.assertIsInstance(raised.exception.__cause__, asyncio.TimeoutError)
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_breaker_turns_calls_away(self):
+        api = self.make_api(answers(FakeResponse(None, status=503)), breaker_failures=2)
+        for _ in range(3):
+            with self.assertRaises(steamapi.SteamAPIUnavailable):
+                self.run_async(api.get_live_league_games())
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(api.breaker(urls.GET_LIVE_LEAGUE_GAMES).rejected, 1)
+
+        # Every endpoint has its own breaker.
+        with self.assertRaises(steamapi.SteamAPIUnavailable):
+            self.run_async(api.get_heroes())
+        self.assertEqual(len(self.requests_to('GetHeroes')), 1)
+
+    def test_slow_requests_are_hedged(self):
+        api = self.make_api(answers(FakeResponse({'result': 'slow'}, delay=0.2), {'result': 'fast'}),
+                            hedge_after=0.01)
+        self.assertEqual(self.run_async(api.get_live_league_games()), {'result': 'fast'})
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(api.hedged, 1)
+
+    def test_failed_hedge_waits_for_the_first_request(self):
+        api = self.make_api(answers(FakeResponse({'result': 'slow'}, delay=0.05), asyncio.TimeoutError()),
+                            hedge_after=0.01)
+        self.assertEqual(self.run_async(api.get_live_league_games()), {'result': 'slow'})
+        self.assertEqual(api.hedged, 1)
+
+    def test_fast_requests_arent_hedged(self):
+        api = self.make_api(hedge_after=0.05)
+        self.run_async(api.get_live_league_games())
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertEqual(api.hedged, 0)
+
+    def test_hedge_gives_up_its_token_wait(self):
+        # The hedge would have to wait a second for a token.
+        api = self.make_api(answers(FakeResponse({'result': 'slow'}, delay=0.05)), hedge_after=0.01,
+                            rate=1.0, burst=1)
+        self.assertEqual(self.run_async(api.get_live_league_games()), {'result': 'slow'})
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertEqual(api.hedged, 0)
+        self.assertEqual(api.limiter.stats()['high']['queued'], 0)
+
+
+def summaries(endpoint, params):
+    return {'response': {'players': [{'steamid': steam_id, 'personaname': 'player' + steam_id}
+                                     for steam_id in params['steamids'].split(',')]}}
+
+
+class SummaryBatchingTest(SteamAPITestCase):
+    def names(self, json):
+        return sorted(player['personaname'] for player in json['response']['players'])
+
+    def test_concurrent_calls_share_a_request(self):
+        api = self.make_api(summaries)
+        first, second = self.run_async(asyncio.gather(api.get_player_summaries(['1', '2']),
+                                                      api.get_player_summaries('2,3')))
+        self.assertEqual(self.names(first), ['player1', 'player2'])
+        self.assertEqual(self.names(second), ['player2', 'player3'])
+
+        requested = self.requests_to('GetPlayerSummaries')
+        self.assertEqual(len(requested), 1)
+        self.assertEqual(sorted(requested[0]['steamids'].split(',')), ['1', '2', '3'])
+
+    def test_cached_players_arent_asked_for(self):
+        api = self.make_api(summaries)
+        self.run_async(api.get_player_summaries(['1', '2']))
+        self.assertEqual(self.names(self.run_async(api.get_player_summaries(['1', '2', '3']))),
+                         ['player1', 'player2', 'player3'])
+        self.assertEqual(self.requests_to('GetPlayerSummaries')[1]['steamids'], '3')
+
+    def test_batches_are_limited(self):
+        api = self.make_api(summaries)
+        steam_ids = [str(i) for i in range(steamapi.SUMMARIES_PER_REQUEST + 1)]
+        result = self.run_async(api.get_player_summaries(steam_ids))
+        self.assertEqual(len(result['response']['players']), len(steam_ids))
+        self.assertEqual(len(self.requests_to('GetPlayerSummaries')), 2)
+
+    def test_failures_are_handed_back(self):
+        api = self.make_api(lambda endpoint, params: FakeResponse(None, status=403))
+        self.assertEqual(self.run_async(api.get_player_summaries(['1'])), {})
+        self.assertEqual(api.summary_batches, {})
+
+    def test_errors_are_raised(self):
+        api = self.make_api(lambda endpoint, params: FakeResponse(None, status=500))
+        with self.assertRaises(steamapi.SteamAPIUnavailable):
+            self.run_async(api.get_player_summaries(['1']))
+        self.assertEqual(api.summary_batches, {})
+
+
+STEAM_ID = 76561198025658226
+DOTA_ID = STEAM_ID - steamapi.ID.STEAM_TO_DOTA_CONSTANT
+
+
+def vanity(endpoint, params):
+    if params['vanityurl'] == 'broken':
+        return FakeResponse(None, status=500)
+    if params['vanityurl'] == 'someone':
+        return {'response': {'success': 1, 'steamid': str(STEAM_ID)}}
+    return {'response': {'success': steamapi.VANITY_NO_MATCH, 'message': 'No match'}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResolveTest(SteamAPITestCase):
+    def test_parse_steam_id(self):
+        known = [
+            STEAM_ID, str(STEAM_ID), DOTA_ID, ' {0} '.format(DOTA_ID),
+            'STEAM_0:0:{0}'.format(DOTA_ID // 2), 'STEAM_1:0:{0}'.format(DOTA_ID // 2),
+            '[U:1:{0}]'.format(DOTA_ID),
+            'https://steamcommunity.com/profiles/{0}/'.format(STEAM_ID),
+            'https://www.dotabuff.com/players/{0}/matches'.format(DOTA_ID),
+        ]
+        for steamthing in known:
+            with self.subTest(steamthing=steamthing):
+                self.assertEqual(steamapi.parse_steam_id(steamthing), (STEAM_ID, None))
+
+        self.assertEqual(steamapi.parse_steam_id('STEAM_0:1:1'), (steamapi.ID.dota_to_steam(3), None))
+        self.assertEqual(steamapi.parse_steam_id('http://steamcommunity.com/id/someone/'), (None, 'someone'))
+        self.assertEqual(steamapi.parse_steam_id('someone'), (None, 'someone'))
+        for nothing in ['', '0', str(steamapi.ID.STEAM_TO_DOTA_CONSTANT), 'https://example.com/x']:
+            with self.subTest(steamthing=nothing):
+                self.assertEqual(steamapi.parse_steam_id(nothing), (None, None))
+
+    def test_resolve_steam_ids(self):
+        api = self.make_api(vanity)
+        steam_ids = self.run_async(api.resolve_steam_ids([
+            DOTA_ID, 'someone', 'https://steamcommunity.com/id/someone', 'nobody', 'broken', '']))
+        self.assertEqual(steam_ids, {
+            str(DOTA_ID): STEAM_ID,
+            'someone': STEAM_ID,
+            'https://steamcommunity.com/id/someone': STEAM_ID,
+            'nobody': None,
+            'broken': None,
+            '': None,
+        })
+        # One request per vanity name, and none for the rest.
+        self.assertEqual(sorted(params['vanityurl'] for params in self.requests_to('ResolveVanityURL')),
+                         ['broken', 'nobody', 'someone'])
+
+    def test_vanity_names_are_cached(self):
+        clock = Clock()
+        api = self.make_api(vanity, vanity_miss_ttl=10)
+        api.vanity_cache = TTLCache(16, 100, timer=clock)
+        for _ in range(2):
+            self.run_async(api.resolve_steam_ids(['someone', 'nobody', 'broken']))
+        self.assertEqual([params['vanityurl'] for params in self.requests_to('ResolveVanityURL')],
+                         ['someone', 'nobody', 'broken', 'broken'])
+
+        # Names nobody had are asked about again sooner.
+        del self.session.requests[:]
+        clock.now = 10
+        self.assertEqual(self.run_async(api.resolve_vanity_name('someone')), STEAM_ID)
+        self.assertIsNone(self.run_async(api.resolve_vanity_name('nobody')))
+        self.assertEqual([params['vanityurl'] for params in self.requests_to('ResolveVanityURL')], ['nobody'])
+
+
+class IDTest(unittest.TestCase):
+    def test_conversions(self):
+        steam_id = 76561198025658226
+        dota_id = steam_id - steamapi.ID.STEAM_TO_DOTA_CONSTANT
+        self.assertEqual(steamapi.ID.steam_to_dota(steam_id), dota_id)
+        self.assertEqual(steamapi.ID.dota_to_steam(dota_id), steam_id)
+        self.assertEqual(steamapi.ID(steam_id).dota_id, dota_id)
+        self.assertEqual(steamapi.ID(dota_id).steam_id, steam_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Tests for Cogs/Utils/usage.py. Run from the DiscordBot folder:
+
+    python -m unittest discover Tests
+"""
+import unittest
+
+from Cogs.Utils.usage import UsageTracker
+
+DAY = 24 * 60 * 60
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class UsageTrackerTest(unittest.TestCase):
+    def setUp(self):
+        # Midnight UTC.
+        self.start = 1000 * DAY
+        self.clock = Clock(self.start)
+        self.usage = UsageTracker(daily_limit=1000, resolution=60, timer=self.clock)
+
+    def test_windows(self):
+        self.usage.record(('GetHeroes', 'high'), 200, 0.1, 100)
+        self.clock.now += 30
+        self.usage.record(('GetHeroes', 'high'), 200, 0.1, 50)
+        self.usage.record(('GetHeroes', 'low'), 200, 0.1)
+        self.clock.now += 40
+        self.usage.record(('GetHeroes', 'high'), 200, 0.1, 25)
+
+        window = self.usage.window(60)
+        self.assertEqual(window[('GetHeroes', 'high')].calls, 3)
+        self.assertEqual(window[('GetHeroes', 'high')].bytes, 175)
+        self.assertEqual(window[('GetHeroes', 'low')].calls, 1)
+
+        # Only the bucket the last request went into.
+        window = self.usage.window(10)
+        self.assertEqual(window[('GetHeroes', 'high')].calls, 1)
+        self.assertNotIn(('GetHeroes', 'low'), window)
+
+    def test_errors(self):
+        for status in [200, 304, 404, 503, 'TimeoutError', None]:
+            self.usage.record('GetHeroes', status, 0.1)
+        bucket = self.usage.window(60)['GetHeroes']
+        self.assertEqual(bucket.calls, 6)
+        self.assertEqual(dict(bucket.errors), {404: 1, 503: 1, 'TimeoutError': 1})
+
+    def test_latency_percentiles(self):
+        for _ in range(9):
+            self.usage.record('GetHeroes', 200, 0.01)
+        self.usage.record('GetHeroes', 200, 3.0)
+        bucket = self.usage.window(60)['GetHeroes']
+        self.assertEqual(bucket.latency(50), 0.05)
+        self.assertEqual(bucket.latency(90), 0.05)
+        self.assertEqual(bucket.latency(99), 5.0)
+
+    def test_old_buckets_are_dropped(self):
+        self.usage.record('GetHeroes', 200, 0.1)
+        self.clock.now += DAY
+        self.usage.record('GetHeroes', 200, 0.1)
+        self.assertEqual(len(self.usage.buckets['GetHeroes']), 1)
+        self.assertEqual(self.usage.window(2 * DAY)['GetHeroes'].calls, 1)
+
+    def test_projected_today(self):
+        self.assertEqual(self.usage.projected_today(), (0, 0))
+
+        self.clock.now = self.start + DAY / 2
+        for _ in range(36):
+            self.usage.record('GetHeroes', 200, 0.1)
+        # Another 36 calls an hour for the 12 hours left.
+        self.assertEqual(self.usage.projected_today(), (36, 36 + 36 * 12))
+
+        self.clock.now = self.start + DAY
+        self.assertEqual(self.usage.projected_today(), (0, 0))
+        self.usage.record('GetHeroes', 200, 0.1)
+        self.assertEqual(self.usage.projected_today()[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,8 @@ import sys
 from collections import Counter
 import os
 
+from Cogs.Utils import matchstore, nodebridge, steamapi
+
 initial_extensions = [
     'Cogs.admin',
     'Cogs.egl',
@@ -31,11 +33,20 @@ log.addHandler(handler)
 help_attrs = dict(hidden=True)
 
 prefix = ['?', '!']
-bot = commands.Bot(command_prefix=prefix, description=description, pm_help=False, help_attrs=help_attrs)
 
 
-#zrpc = zerorpc.Client()
-#zrpc.connect("tcp://127.0.0.1:4242")
+class MT5ABot(commands.Bot):
+    async def logout(self):
+        # run() closes the loop right after logging out, so the shared clients
+        # have to be closed here while it's still running.
+        await super().logout()
+        self.steam_api.close()
+        self.node.close()
+        self.match_store.close()
+
+
+bot = MT5ABot(command_prefix=prefix, description=description, pm_help=False, help_attrs=help_attrs)
+
 
 @bot.event
 async def on_command_error(error, ctx):
@@ -90,6 +101,15 @@ if __name__ == '__main__':
     bot.steam_api_key = credentials['steam_api_key']
     bot.dropbox_token = credentials['dropbox_token']
 
+    # The Dota match ticker follows every match Steam finishes, so it only
+    # runs when "match_ticker": true is in the config.
+    bot.match_ticker = credentials.get('match_ticker', False)
+
+    # Shared by every cog so they all go through the same connection pool.
+    bot.match_store = matchstore.MatchStore('Dota/matches.db', loop=bot.loop)
+    bot.steam_api = steamapi.SteamAPI(bot.steam_api_key, loop=bot.loop, match_store=bot.match_store)
+    bot.node = nodebridge.NodeBridge(loop=bot.loop)
+
     for extension in initial_extensions:
         try:
             bot.load_extension(extension)
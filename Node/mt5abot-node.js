@@ -5,7 +5,7 @@ var steam = require("steam"),
 	crypto = require("crypto"),
 
     kvparse = require('binarykvparser'),
-	zerorpc = require("zerorpc"),
+	net = require("net"),
 
     steamClient = new steam.SteamClient(),
     steamUser = new steam.SteamUser(steamClient),
@@ -19,10 +19,7 @@ var steam = require("steam"),
 
     user_rich_presence_data = {}
     dota_user_stats = {}
-    dota_user_playing_as = {},
-
-    zrpc_friend_data_request_locked = false,
-    zrpc_rich_presence_request_locked = false;
+    dota_user_playing_as = {};
 
 // Load credentials file
 global.credentials = require("../Config/config.json");
@@ -152,6 +149,252 @@ var onSteamLogOn = function onSteamLogOn(logonResp) {
         util.log("This actually does something.")
 	};
 
+// Pulls [solo MMR, party MMR] out of a profile card, undefined where they're hidden.
+var profileCardMMR = function profileCardMMR(card) {
+	var data = {};
+	card.slots.forEach(function(item) {
+	    if (item.stat) {
+	        data[item.stat.stat_id] = item.stat.stat_score;
+	    }
+	});
+	return [data[1], data[2]];
+};
+
+/*
+    Profile card cache
+
+    Cards only change after a match, so they're kept for `ttl` ms. Once
+    `maxSize` are kept the ones stored longest ago make room.
+*/
+
+var TTLCache = function TTLCache(maxSize, ttl) {
+    this.maxSize = maxSize;
+    this.ttl = ttl;
+    this.entries = new Map();
+    this.hits = 0;
+    this.misses = 0;
+};
+
+TTLCache.prototype.get = function(key) {
+    var entry = this.entries.get(key);
+    if (entry === undefined || entry.expires < Date.now()) {
+        this.entries.delete(key);
+        this.misses++;
+        return undefined;
+    }
+    this.hits++;
+    return entry.value;
+};
+
+TTLCache.prototype.set = function(key, value) {
+    // Maps iterate in insertion order, so the oldest entry is always first.
+    this.entries.delete(key);
+    this.entries.set(key, {value: value, expires: Date.now() + this.ttl});
+    while (this.entries.size > this.maxSize) {
+        this.entries.delete(this.entries.keys().next().value);
+    }
+};
+
+TTLCache.prototype.stats = function() {
+    var lookups = this.hits + this.misses;
+    return {
+        size: this.entries.size,
+        hits: this.hits,
+        misses: this.misses,
+        hit_rate: lookups ? this.hits / lookups : 0
+    };
+};
+
+var profileCards = new TTLCache(5000, 15 * 60 * 1000);
+
+// Replies with transform(card) for the profile card of dotaid, from the cache unless fresh is set.
+var withProfileCard = function withProfileCard(dotaid, fresh, reply, transform) {
+	var cardReply = function(err, card) {
+	    if (err) {
+	        reply(err);
+	    } else {
+	        reply(null, transform(card));
+	    }
+	};
+	cardReply.id = reply.id;
+	cardReply.deadline = reply.deadline;
+
+	var card = fresh ? undefined : profileCards.get(Number(dotaid));
+	if (card !== undefined) {
+	    cardReply(null, card);
+	    return;
+	}
+
+	gcQueue.push(function(done, id) {
+	    util.log(util.format("ZRPC: Fetching profile card for %s (%s)", dotaid, id));
+
+	    dotaClient.requestProfileCard(Number(dotaid), function(err, body) {
+	        util.log(util.format('Got data for %s (%s)', dotaid, id));
+	        if (err || !body) {
+	            done("No profile card for " + dotaid);
+	            return;
+	        }
+	        profileCards.set(Number(dotaid), body);
+	        done(null, body);
+	    });
+	}, cardReply);
+};
+
+// Reshapes a CMsgDOTAMatch from the GC like the Web API's GetMatchDetails result.
+var webApiMatch = function webApiMatch(match) {
+	var number = function(value) {
+	    return value === undefined || value === null ? value : Number(value.toString());
+	};
+
+	return {
+	    match_id: number(match.match_id),
+	    match_seq_num: number(match.match_seq_num),
+	    radiant_win: !!match.good_guys_win,
+	    duration: match.duration,
+	    start_time: match.startTime,
+	    lobby_type: match.lobby_type,
+	    game_mode: match.game_mode,
+	    cluster: match.cluster,
+	    human_players: match.players.length,
+	    players: match.players.map(function(player) {
+	        return {
+	            account_id: player.account_id,
+	            player_slot: player.player_slot,
+	            hero_id: player.hero_id,
+	            item_0: player.item_0,
+	            item_1: player.item_1,
+	            item_2: player.item_2,
+	            item_3: player.item_3,
+	            item_4: player.item_4,
+	            item_5: player.item_5,
+	            kills: player.kills,
+	            deaths: player.deaths,
+	            assists: player.assists,
+	            leaver_status: player.leaver_status,
+	            last_hits: player.last_hits,
+	            denies: player.denies,
+	            gold_per_min: player.gold_per_min,
+	            xp_per_min: player.XP_per_min,
+	            level: player.level,
+	            hero_damage: player.hero_damage,
+	            tower_damage: player.tower_damage,
+	            hero_healing: player.hero_healing
+	        };
+	    })
+	};
+};
+
+/*
+    Request queues
+
+    Requests that can't all run at once wait their turn here instead of
+    being turned away. A queue runs up to `concurrency` tasks at a time in
+    the order they came in and turns requests away only once `maxDepth` are
+    waiting. Requests whose caller has given up by the time their turn comes
+    are dropped, and tasks that never finish are failed after `timeout` ms.
+*/
+
+var RequestQueue = function RequestQueue(name, concurrency, maxDepth, timeout) {
+    this.name = name;
+    this.concurrency = concurrency;
+    this.maxDepth = maxDepth;
+    this.timeout = timeout;
+
+    this.waiting = [];
+    this.running = 0;
+    this.nextId = 1;
+
+    this.served = 0;
+    this.rejected = 0;
+    this.expired = 0;
+    this.waitTotal = 0;
+    this.waitMax = 0;
+};
+
+// Queues task(done, id), which must call done(err, result) once it has an answer for reply.
+RequestQueue.prototype.push = function(task, reply) {
+    // Bridge requests come with their own correlation id and deadline.
+    var id = reply.id !== undefined ? reply.id : this.name + '-' + this.nextId++;
+
+    if (this.waiting.length >= this.maxDepth) {
+        this.rejected++;
+        util.log(util.format('Queue %s: Turning away %s, %d waiting', this.name, id, this.waiting.length));
+        reply("Queue full");
+        return;
+    }
+
+    this.waiting.push({id: id, task: task, reply: reply, queued: Date.now(), deadline: reply.deadline});
+    this.next();
+};
+
+RequestQueue.prototype.next = function() {
+    while (this.running < this.concurrency && this.waiting.length) {
+        var request = this.waiting.shift(),
+            now = Date.now();
+
+        if (request.deadline && now > request.deadline) {
+            this.expired++;
+            request.reply("Expired");
+            continue;
+        }
+
+        var waited = now - request.queued;
+        this.waitTotal += waited;
+        this.waitMax = Math.max(this.waitMax, waited);
+        this.running++;
+        this.run(request);
+    }
+};
+
+RequestQueue.prototype.run = function(request) {
+    var self = this,
+        finished = false,
+        timer;
+
+    var done = function(err, result) {
+        if (finished) {
+            return;
+        }
+        finished = true;
+        clearTimeout(timer);
+
+        self.running--;
+        self.served++;
+        request.reply(err, result);
+        self.next();
+    };
+
+    timer = setTimeout(function() {
+        util.log(util.format('Queue %s: %s timed out', self.name, request.id));
+        done("Timed out");
+    }, this.timeout);
+
+    try {
+        request.task(done, request.id);
+    } catch (e) {
+        done(e.toString());
+    }
+};
+
+RequestQueue.prototype.stats = function() {
+    var started = this.served + this.running;
+    return {
+        waiting: this.waiting.length,
+        running: this.running,
+        served: this.served,
+        rejected: this.rejected,
+        expired: this.expired,
+        wait_avg: started ? this.waitTotal / started : 0,
+        wait_max: this.waitMax
+    };
+};
+
+// Requests answered by a GC callback, so several can be out at once.
+var gcQueue = new RequestQueue('gc', 4, 200, 10000),
+    // Rich presence replies can only be told apart by their contents, so one at a time.
+    richPresenceQueue = new RequestQueue('rich_presence', 1, 50, 9500),
+    requestQueues = [gcQueue, richPresenceQueue];
+
 var accountDetails = {
 	"account_name": global.credentials.steam_user,
     "password": global.credentials.steam_pass,
@@ -167,7 +410,7 @@ steamClient.on('richPresence', onRichPresence)
 steamFriends.on('message', onMessage);
 steamFriends.on('friend', onFriend);
 
-var zrpcserver = new zerorpc.Server({
+var bridgeMethods = {
     /*
         General functions
     */
@@ -240,7 +483,23 @@ var zrpcserver = new zerorpc.Server({
 
 	    if (match_id === undefined) {
 	        reply("No match id.");
+	        return;
 	    }
+
+	    if (!dotaClient._gcReady) {
+	        reply(null, false);
+	        return;
+	    }
+
+	    gcQueue.push(function(done) {
+	        dotaClient.requestMatchDetails(Number(match_id), function(err, body) {
+	            if (err || !body || !body.match) {
+	                done(null, false);
+	                return;
+	            }
+	            done(null, JSON.stringify(webApiMatch(body.match)));
+	        });
+	    }, reply);
 	},
 
 	get_player_info: function(account_ids, reply) {
@@ -253,34 +512,38 @@ var zrpcserver = new zerorpc.Server({
 	    dotaClient.requestPlayerInfo(account_ids);
 	},
 
-	get_profile_card: function(dotaid, reply) {
+	get_profile_card: function(dotaid, fresh, reply) {
         reply = arguments[arguments.length - 1];
         dotaid = typeof dotaid !== 'function' ? dotaid : null;
+        fresh = typeof fresh !== 'function' ? !!fresh : false;
 
         if (!dotaid) {
             reply("Bad arguments");
             return;
         }
 
-        if (!Dota2._gcReady) {
+        if (!dotaClient._gcReady) {
             reply(null, false);
             return;
         }
 
-        Dota2.requestProfileCard(Number(dotaid), function(err, body){
-            util.log(util.format('Got data for %s', dotaid));
-            reply(null, JSON.stringify(body));
-        });
+        withProfileCard(dotaid, fresh, reply, JSON.stringify);
+    },
+
+    cache_stats: function(reply) {
+        reply = arguments[arguments.length - 1];
+        reply(null, {profile_cards: profileCards.stats()});
     },
 
     /*
         MMR function
     */
 
-	get_mmr_for_dotaid: function(dotaid, reply) {
+	get_mmr_for_dotaid: function(dotaid, fresh, reply) {
 	    util.log("Received message")
 		reply = arguments[arguments.length - 1];
 		dotaid = typeof dotaid !== 'function' ? dotaid : null;
+		fresh = typeof fresh !== 'function' ? !!fresh : false;
 
 		if (!dotaid) {
 			reply("Bad arguments");
@@ -292,18 +555,46 @@ var zrpcserver = new zerorpc.Server({
 			return;
 		}
 
-		util.log("ZRPC: Fetching mmr for " + dotaid);
+		withProfileCard(dotaid, fresh, reply, profileCardMMR);
+	},
 
-		dotaClient.requestProfileCard(Number(dotaid), function(err, body){
-			util.log(util.format('Got data for %s', dotaid));
-			var data = {};
-			body.slots.forEach(function(item) {
-            	if (item.stat) {
-                    data[item.stat.stat_id] = item.stat.stat_score;
-            	}
-            });
-            reply(null, [data[1], data[2]]);
-		})
+	// Replies {dotaid: [solo, party]} with null for the accounts whose card couldn't be had.
+	get_mmr_for_dotaids: function(dotaids, fresh, reply) {
+	    reply = arguments[arguments.length - 1];
+	    dotaids = Array.isArray(dotaids) ? dotaids : null;
+	    fresh = typeof fresh !== 'function' ? !!fresh : false;
+
+	    if (!dotaids) {
+	        reply("Bad arguments");
+	        return;
+	    }
+
+	    if (!dotaClient._gcReady) {
+	        reply(null, false);
+	        return;
+	    }
+
+	    var results = {},
+	        remaining = dotaids.length;
+
+	    if (!remaining) {
+	        reply(null, results);
+	        return;
+	    }
+
+	    // Cards that aren't cached each wait their own turn in the GC queue, so they go out side by side.
+	    dotaids.forEach(function(dotaid, i) {
+	        var cardReply = function(err, mmr) {
+	            results[dotaid] = err ? null : mmr;
+	            if (--remaining === 0) {
+	                reply(null, results);
+	            }
+	        };
+	        cardReply.id = reply.id !== undefined ? reply.id + '.' + i : undefined;
+	        cardReply.deadline = reply.deadline;
+
+	        withProfileCard(dotaid, fresh, cardReply, profileCardMMR);
+	    });
 	},
 
 	/*
@@ -379,52 +670,50 @@ var zrpcserver = new zerorpc.Server({
 	    reply = arguments[arguments.length - 1];
 	    steamids = Array.isArray(steamids) ? steamids : [steamids]
 
-	    if (zrpc_rich_presence_request_locked) {
-	        reply("busy")
-	        return
-	    }
-
 	    if (!steamClient.loggedOn) {
 	        reply("Steam not ready")
 	        return
 	    }
 
-	    var expected_response_count = steamids.length,
-	        sent_data = false;
-	    zrpc_rich_presence_request_locked = True;
-
-	    var rp_listener = function(info) {
-	        if (info.rich_presence.length == expected_response_count && steamids[0] == info.rich_presence[0].steamid_user) {
-	            var data = {};
-	            for (var i = info.rich_presence.length - 1; i >= 0; i--) {
-	                try {
-                        kvdata = kvparse.parse(info.rich_presence[i].rich_presence_kv);
-	                } catch (e) {
-	                    console.log('ZRPC Error: Bad rich presence data for ', info.rich_presence[i].steamid_user);
-	                    data[info.rich_presence[i].steamid_user] = null;
-	                    continue;
+	    richPresenceQueue.push(function(done) {
+	        var expected_response_count = steamids.length;
+
+	        var rp_listener = function(info) {
+	            if (info.rich_presence.length == expected_response_count && steamids[0] == info.rich_presence[0].steamid_user) {
+	                var data = {};
+	                for (var i = info.rich_presence.length - 1; i >= 0; i--) {
+	                    try {
+                            kvdata = kvparse.parse(info.rich_presence[i].rich_presence_kv);
+	                    } catch (e) {
+	                        console.log('ZRPC Error: Bad rich presence data for ', info.rich_presence[i].steamid_user);
+	                        data[info.rich_presence[i].steamid_user] = null;
+	                        continue;
+	                    }
+
+	                    data[info.rich_presence[i].steamid_user] = kvdata.RP;
 	                }
-
-	                data[info.rich_presence[i].steamid_user] = kvdata.RP;
+	                steamRichPresence.removeListener('info', rp_listener);
+	                done(null, JSON.stringify(data))
 	            }
-	            steamRichPresence.removeListener('info', rp_listener);
-	            zrpc_rich_presence_request_locked = false;
-	            sent_data = true;
-	            reply(null, JSON.stringify(data))
-	        }
-	    };
-
-	    setTimeout(function() {
-	        if(!sent_data) {
-	            reply("Did not receive the desired response.")
+	        };
 
+	        setTimeout(function() {
 	            steamRichPresence.removeListener('info', rp_listener);
-	            zrpc_rich_presence_request_locked = false;
-	        }
-        }, 9500)
+	            done("Did not receive the desired response.")
+            }, 9000)
 
-        steamRichPresence.on('info', rp_listener);
-        steamRichPresence.request({steamid_request: steamids})
+            steamRichPresence.on('info', rp_listener);
+            steamRichPresence.request({steamid_request: steamids})
+	    }, reply);
+	},
+
+	queue_stats: function(reply) {
+	    reply = arguments[arguments.length - 1];
+	    var stats = {};
+	    requestQueues.forEach(function(queue) {
+	        stats[queue.name] = queue.stats();
+	    });
+	    reply(null, stats);
 	},
 
 	kill: function(reply) {
@@ -434,15 +723,86 @@ var zrpcserver = new zerorpc.Server({
         }, 1000);
         reply(null, true);
     }
-});
+};
+
+/*
+    JSON lines bridge
+
+    Serves bridgeMethods to the bot's asyncio client. Every line sent is a
+    request {"id": ..., "method": ..., "args": [...]} and gets one line back,
+    {"id": ..., "error": ..., "result": ...}, whenever the method replies,
+    so requests on one connection don't wait for each other.
+*/
+
+var bridgeserver = net.createServer(function(socket) {
+    var buffered = '';
+
+    var send = function(id, err, result) {
+        if (socket.destroyed) {
+            return;
+        }
+        socket.write(JSON.stringify({id: id, error: err === undefined ? null : err,
+                                     result: result === undefined ? null : result}) + '\n');
+    };
+
+    var handle = function(line) {
+        var request;
+        try {
+            request = JSON.parse(line);
+        } catch (e) {
+            console.log('Bridge Error: Bad request ', line);
+            return;
+        }
+
+        var method = bridgeMethods[request.method];
+        if (typeof method !== 'function') {
+            send(request.id, "Unknown method " + request.method);
+            return;
+        }
+
+        // Some methods can reply more than once, only the first one counts.
+        var replied = false;
+        var reply = function(err, result) {
+            if (!replied) {
+                replied = true;
+                send(request.id, err, result);
+            }
+        };
+        // For the request queues.
+        reply.id = request.id;
+        if (request.timeout) {
+            reply.deadline = Date.now() + request.timeout;
+        }
 
+        try {
+            method.apply(null, (request.args || []).concat([reply]));
+        } catch (e) {
+            reply(e.toString());
+        }
+    };
+
+    socket.setEncoding('utf8');
+    socket.on('data', function(data) {
+        var lines = (buffered + data).split('\n');
+        buffered = lines.pop();
+        lines.forEach(function(line) {
+            if (line) {
+                handle(line);
+            }
+        });
+    });
+
+    socket.on('error', function(err) {
+        console.error("Bridge connection error: ", err);
+    });
+});
 
-zrpcserver.on("error", function(err) {
-    console.error("RPC server error: ", err);
+bridgeserver.on("error", function(err) {
+    console.error("Bridge server error: ", err);
 });
 
-zrpcserver.bind("tcp://0.0.0.0:4242");
-util.log('Starting zrpc server');
+bridgeserver.listen(4243, "127.0.0.1");
+util.log('Starting bridge server');
 
 process.on('error', function(err) {
     console.error("Process error: ", err);